@@ -0,0 +1,185 @@
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models.signals import post_save, post_delete
+
+from CorralSnake.search import search_terms
+
+
+class PrefixIndex:
+    """
+    In-memory sorted index of lowercased words of some fields, answering prefix lookups with a binary search.
+
+    The index is loaded lazily once per process and kept up to date incrementally from post_save/post_delete
+    after the transaction commits; saves that leave the indexed fields alone are skipped. Every change is also
+    logged in the shared cache under a bumped version, so other processes replay it, checking at most every
+    AUTOCOMPLETE_STALE_SECONDS. A process that fell further behind than the log reaches reloads in a background
+    thread and keeps answering from its current index meanwhile.
+    """
+    # How many logged changes a process replays before it reloads instead.
+    max_replayed_changes = 1000
+
+    def __init__(self, fields, label_field):
+        self.fields = fields
+        self.label_field = label_field
+        self.model = None
+        self.lock = threading.Lock()
+        self.loading = threading.Lock()
+        self.keys = None
+        self.entries = {}
+        self.version = None
+        self.checked_at = 0
+
+    @property
+    def version_key(self):
+        return f'autocomplete:{self.model._meta.label_lower}:version'
+
+    def _change_key(self, version):
+        return f'autocomplete:{self.model._meta.label_lower}:change:{version}'
+
+    def connect(self, model):
+        self.model = model
+        post_save.connect(self._saved, sender=model, weak=False)
+        post_delete.connect(self._deleted, sender=model, weak=False)
+
+    def _words(self, values):
+        return {word for value in values for word in search_terms((value or '').lower())}
+
+    def _shared_version(self):
+        version = cache.get(self.version_key)
+        if version is None:
+            cache.add(self.version_key, time.time_ns())
+            version = cache.get(self.version_key)
+        return version
+
+    def _bump_shared_version(self):
+        try:
+            return cache.incr(self.version_key)
+        except ValueError:
+            cache.set(self.version_key, time.time_ns())
+            return None
+
+    def load(self):
+        version = self._shared_version()
+        keys, entries = [], {}
+        rows = self.model.objects.values_list('pk', 'public_id', self.label_field, *self.fields)
+        for pk, public_id, label, *values in rows.iterator(chunk_size=10000):
+            words = self._words(values)
+            entries[pk] = (str(public_id), label, words)
+            keys.extend((word, pk) for word in words)
+        keys.sort()
+
+        with self.lock:
+            self.keys, self.entries, self.version = keys, entries, version
+            self.checked_at = time.monotonic()
+
+    def _load_once(self):
+        """
+        Loads the index unless another thread is loading it already.
+        """
+        if not self.loading.acquire(blocking=False):
+            return
+        try:
+            self.load()
+        finally:
+            self.loading.release()
+            connections.close_all()
+
+    def _ensure_fresh(self):
+        if self.keys is None:
+            with self.loading:
+                if self.keys is None:
+                    self.load()
+            return
+        if time.monotonic() - self.checked_at <= settings.AUTOCOMPLETE_STALE_SECONDS:
+            return
+
+        self.checked_at = time.monotonic()
+        version, known = self._shared_version(), self.version
+        if version == known:
+            return
+        changes = {}
+        if 0 < version - known <= self.max_replayed_changes:
+            changes = cache.get_many([self._change_key(logged) for logged in range(known + 1, version + 1)])
+        if len(changes) != version - known:
+            threading.Thread(target=self._load_once, name='autocomplete-load', daemon=True).start()
+            return
+        with self.lock:
+            if self.version != known:
+                return
+            for logged in range(known + 1, version + 1):
+                self._replace(*changes[self._change_key(logged)])
+            self.version = version
+
+    def lookup(self, query, limit):
+        """
+        Returns up to `limit` (public_id, label) pairs whose words start with every term of the query.
+        Only the narrowest term's range of the index is scanned, in alphabetical order.
+        """
+        terms = set(search_terms(query.lower()))
+        if not terms:
+            return []
+        self._ensure_fresh()
+
+        suggestions = []
+        with self.lock:
+            ranges = {term: (bisect_left(self.keys, (term,)), bisect_left(self.keys, (term + '\uffff',)))
+                      for term in terms}
+            scanned = min(terms, key=lambda term: ranges[term][1] - ranges[term][0])
+            others = terms - {scanned}
+
+            seen = set()
+            for index in range(*ranges[scanned]):
+                if len(suggestions) == limit:
+                    break
+                pk = self.keys[index][1]
+                if pk in seen:
+                    continue
+                seen.add(pk)
+
+                public_id, label, words = self.entries[pk]
+                if all(any(word.startswith(term) for word in words) for term in others):
+                    suggestions.append((public_id, label))
+        return suggestions
+
+    def _replace(self, pk, entry):
+        for word in self.entries.pop(pk, (None, None, ()))[2]:
+            index = bisect_left(self.keys, (word, pk))
+            if index < len(self.keys) and self.keys[index] == (word, pk):
+                del self.keys[index]
+        if entry is not None:
+            self.entries[pk] = entry
+            for word in entry[2]:
+                insort(self.keys, (word, pk))
+
+    def _apply(self, pk, entry):
+        version = self._bump_shared_version()
+        if version is not None:
+            cache.set(self._change_key(version), (pk, entry))
+        with self.lock:
+            if self.keys is None:
+                return
+            self._replace(pk, entry)
+            if version is not None and self.version is not None and version == self.version + 1:
+                self.version = version
+            else:
+                self.checked_at = 0
+
+    def _saved(self, sender, instance, raw=False, update_fields=None, **kwargs):
+        if raw:
+            return
+        if update_fields is not None and not {'public_id', self.label_field, *self.fields}.intersection(update_fields):
+            return
+        entry = (str(instance.public_id), getattr(instance, self.label_field),
+                 self._words(getattr(instance, field) for field in self.fields))
+        if self.entries.get(instance.pk) == entry:
+            return
+        transaction.on_commit(lambda: self._apply(instance.pk, entry), using=instance._state.db)
+
+    def _deleted(self, sender, instance, **kwargs):
+        pk = instance.pk
+        transaction.on_commit(lambda: self._apply(pk, None), using=instance._state.db)
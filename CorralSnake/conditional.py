@@ -0,0 +1,47 @@
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+
+class ConditionalRetrieveMixin:
+    """
+    Lets clients revalidate retrieved objects instead of downloading them again.
+
+    `validator_fields` are the updated_at columns of the object and of every related row its serializer renders.
+    They are read with one small query, and their latest value gives the ETag and Last-Modified. A matching
+    If-None-Match or If-Modified-Since is answered with 304 before the object is loaded or serialized.
+    Views with a cheaper version of their own override get_validators().
+    """
+    validator_fields = ['updated_at']
+
+    def get_validators(self, request):
+        """
+        Returns a version number and the last modification time of the object to retrieve, which may be None,
+        or None when there is no such object.
+        """
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = self.queryset.model._default_manager.filter(
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}).values_list(*self.validator_fields).first()
+        if row is None:
+            return None
+        last_modified = max(value for value in row if value is not None)
+        return int(last_modified.timestamp() * 1_000_000), last_modified
+
+    def get_not_modified_response(self, request):
+        validators = self.get_validators(request)
+        if validators is None:
+            return None
+
+        version, self.last_modified = validators
+        self.etag = f'"{version:x}-{request.accepted_renderer.format}"'
+        last_modified = int(self.last_modified.timestamp()) if self.last_modified is not None else None
+        return get_conditional_response(request, etag=self.etag, last_modified=last_modified)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, 'etag', None) and response.status_code in (200, 304):
+            response['ETag'] = self.etag
+            if self.last_modified is not None:
+                response['Last-Modified'] = http_date(self.last_modified.timestamp())
+            # Responses depend on the user's permissions, and must always be revalidated.
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
@@ -0,0 +1,21 @@
+from django.core.files.storage import default_storage
+from rest_framework import serializers
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """
+    Represents a {variant name: stored file name} map as variant URLs,
+    absolute when the request is in the context, like ImageField does.
+    """
+
+    def __init__(self, storage=default_storage, **kwargs):
+        self.storage = storage
+        super().__init__(**kwargs)
+
+    def to_representation(self, variants):
+        request = self.context.get('request')
+        urls = {}
+        for variant, name in variants.items():
+            url = self.storage.url(name)
+            urls[variant] = request.build_absolute_uri(url) if request is not None else url
+        return urls
@@ -0,0 +1,127 @@
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from io import BytesIO
+
+import django
+from PIL import Image, ImageOps
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+
+from CorralSnake.utils import auto_now_fields
+
+logger = logging.getLogger(__name__)
+
+IMAGE_WIDTHS = [320, 640, 1280]
+
+_executor = None
+
+
+def get_executor():
+    """
+    The image worker pool, IMAGE_WORKERS threads or, with IMAGE_WORKER_POOL set to 'process',
+    freshly spawned processes that set up Django once and keep Pillow off the web workers' GIL.
+    """
+    global _executor
+    if _executor is None:
+        if settings.IMAGE_WORKER_POOL == 'process':
+            _executor = ProcessPoolExecutor(max_workers=settings.IMAGE_WORKERS,
+                                            mp_context=multiprocessing.get_context('spawn'),
+                                            initializer=django.setup)
+        else:
+            _executor = ThreadPoolExecutor(max_workers=settings.IMAGE_WORKERS, thread_name_prefix='images')
+    return _executor
+
+
+def _run(task, *args):
+    try:
+        task(*args)
+    except Exception:
+        logger.exception('Image task %s%r failed', task.__name__, args)
+    finally:
+        connections.close_all()
+
+
+def process_later(task, *args):
+    """
+    Runs task(*args) in the image worker pool once the current transaction commits,
+    or right away in the calling thread when IMAGE_WORKERS is 0.
+    """
+    def submit():
+        if settings.IMAGE_WORKERS == 0:
+            task(*args)
+        else:
+            get_executor().submit(_run, task, *args)
+
+    transaction.on_commit(submit)
+
+
+def _open(storage, name):
+    with storage.open(name) as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        image.load()
+
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+    return image
+
+
+def square_variants(image, sizes):
+    """
+    Center cropped size x size copies, named by size.
+    """
+    for size in sizes:
+        yield str(size), ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+
+
+def width_variants(image, widths):
+    """
+    Copies downscaled to each width narrower than the image plus one at full width, named like srcset descriptors.
+    """
+    for width in widths:
+        if width < image.width:
+            yield f'{width}w', image.resize((width, round(image.height * width / image.width)),
+                                           Image.Resampling.LANCZOS)
+    yield f'{image.width}w', image
+
+
+VARIANT_RENDERERS = {
+    'square': square_variants,
+    'width': width_variants,
+}
+
+
+def render_variants(field, name, kind, sizes):
+    """
+    Renders WebP variants of an image and returns the (name, content) to store each of them under by variant.
+    """
+    image = _open(field.storage, name)
+
+    variants = {}
+    for variant, variant_image in VARIANT_RENDERERS[kind](image, sizes):
+        buffer = BytesIO()
+        variant_image.save(buffer, 'WEBP', quality=settings.IMAGE_WEBP_QUALITY)
+        variants[variant] = (field.generate_filename(None, f'{variant}.webp'), ContentFile(buffer.getvalue()))
+    return variants
+
+
+def process_image(model_label, pk, field_name, name, kind, sizes):
+    """
+    Renders the variants of a freshly uploaded image into <field_name>_variants.
+    Variants of an image that was replaced in the meantime are thrown away.
+    Rendering runs outside the transaction, storing the variants inside it, where their references are counted.
+    """
+    model = apps.get_model(model_label)
+    field = model._meta.get_field(field_name)
+    rendered = render_variants(field, name, kind, sizes)
+
+    with transaction.atomic():
+        instance = model._default_manager.select_for_update().filter(pk=pk, **{field_name: name}).first()
+        if instance is None:
+            return
+        variants = {variant: field.storage.save(variant_name, content)
+                    for variant, (variant_name, content) in rendered.items()}
+        setattr(instance, f'{field_name}_variants', variants)
+        instance.save(update_fields=[f'{field_name}_variants', *auto_now_fields(model)])
@@ -0,0 +1,29 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination over the `id` ordering, so every page is one indexed range query
+    instead of a COUNT(*) followed by an ever growing OFFSET.
+    Requests with ?page= keep getting page number pagination for backwards compatibility.
+    """
+    ordering = 'id'
+
+    def __init__(self):
+        self.page_number_pagination = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if PageNumberPagination.page_query_param in request.query_params:
+            self.page_number_pagination = PageNumberPagination()
+            return self.page_number_pagination.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.page_number_pagination is not None:
+            return self.page_number_pagination.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def to_html(self):
+        if self.page_number_pagination is not None:
+            return self.page_number_pagination.to_html()
+        return super().to_html()
@@ -0,0 +1,94 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from rest_framework.permissions import SAFE_METHODS
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+PIN_COOKIE = 'primary_pin'
+PIN_SALT = 'CorralSnake.replicas.primary_pin'
+
+
+def pin_to_primary(response, user):
+    """
+    Sends the user's reads to the primary for REPLICA_PIN_SECONDS, so they see their own writes
+    while the replicas catch up. The pin is a signed cookie that travels with the client,
+    so it holds on every worker without a shared cache.
+    """
+    response.set_signed_cookie(PIN_COOKIE, str(user.pk), salt=PIN_SALT, max_age=settings.REPLICA_PIN_SECONDS,
+                               httponly=True, samesite='Lax')
+
+
+def is_pinned_to_primary(request):
+    """
+    Checks the pin cookie, whose signature carries the time it was set, against the authenticated user.
+    """
+    if not request.user.is_authenticated:
+        return False
+    pinned_pk = request.get_signed_cookie(PIN_COOKIE, default=None, salt=PIN_SALT,
+                                          max_age=settings.REPLICA_PIN_SECONDS)
+    return pinned_pk == str(request.user.pk)
+
+
+class ReplicaRouter:
+    """
+    Routes reads to a random DATABASE_REPLICAS alias while a ReplicaReadMixin view runs one of its read actions,
+    everything else goes to the primary. Replicas are copies of the primary and are never migrated themselves.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get() and settings.DATABASE_REPLICAS:
+            return random.choice(settings.DATABASE_REPLICAS)
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {'default', *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class PrimaryPinMiddleware:
+    """
+    Pins users to the primary after every successful write request they make.
+    DRF sets the authenticated user on the underlying request, so it is known here once the view ran.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        user = getattr(request, 'user', None)
+        if (settings.DATABASE_REPLICAS and request.method not in SAFE_METHODS and response.status_code < 400
+                and user is not None and user.is_authenticated):
+            pin_to_primary(response, user)
+        return response
+
+
+class ReplicaReadMixin:
+    """
+    Serves `replica_actions` from the replicas, unless the user wrote something moments ago.
+    """
+    replica_actions = {'retrieve', 'list'}
+
+    def dispatch(self, request, *args, **kwargs):
+        token = _replica_reads.set(False)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            _replica_reads.reset(token)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.action in self.replica_actions and not is_pinned_to_primary(request):
+            _replica_reads.set(True)
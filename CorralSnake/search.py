@@ -0,0 +1,316 @@
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_save, post_delete
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.settings import api_settings
+
+SQLITE_WEIGHTS = {'A': 10.0, 'B': 4.0, 'C': 2.0, 'D': 1.0}
+
+
+def search_terms(query):
+    return re.findall(r'\w+', query or '')
+
+
+def no_results(queryset):
+    return queryset.annotate(rank=Value(0.0, output_field=FloatField())).none()
+
+
+class FullTextIndex:
+    """
+    Ranked full-text index over text columns of a table, weighted 'A' (most important) to 'D'.
+
+    SQLite: an FTS5 table named <table>_fts whose rowid is the row's id, kept in sync from post_save/post_delete.
+    Searches join it through an unmanaged model over the table, related to the indexed model as `search_entry`.
+    PostgreSQL: a GIN expression index over the weighted tsvector, which the database keeps in sync itself.
+    Ranks are ascending, lower is more relevant, on both backends.
+    """
+
+    def __init__(self, table, fields, config='simple'):
+        self.table = table
+        self.fields = fields
+        self.config = config
+
+    @property
+    def fts_table(self):
+        return f'{self.table}_fts'
+
+    def _tsvector_sql(self, prefix=''):
+        return ' || '.join(
+            f"setweight(to_tsvector('{self.config}', coalesce({prefix}\"{field}\", '')), '{weight}')"
+            for field, weight in self.fields.items()
+        )
+
+    def create(self, schema_editor):
+        columns = ', '.join(self.fields)
+        if schema_editor.connection.vendor == 'sqlite':
+            schema_editor.execute(
+                f'CREATE VIRTUAL TABLE "{self.fts_table}" USING fts5({columns}, tokenize="unicode61 remove_diacritics 2")'
+            )
+            self.rebuild(schema_editor.connection.alias)
+        elif schema_editor.connection.vendor == 'postgresql':
+            schema_editor.execute(f'CREATE INDEX "{self.fts_table}_idx" ON "{self.table}" USING GIN (({self._tsvector_sql()}))')
+
+    def drop(self, schema_editor):
+        if schema_editor.connection.vendor == 'sqlite':
+            schema_editor.execute(f'DROP TABLE IF EXISTS "{self.fts_table}"')
+        elif schema_editor.connection.vendor == 'postgresql':
+            schema_editor.execute(f'DROP INDEX IF EXISTS "{self.fts_table}_idx"')
+
+    def rebuild(self, using='default'):
+        """
+        Refills the SQLite index from the table, e.g. after bulk writes that bypassed signals.
+        """
+        if connections[using].vendor != 'sqlite':
+            return
+        columns = ', '.join(self.fields)
+        with connections[using].cursor() as cursor:
+            cursor.execute(f'DELETE FROM "{self.fts_table}"')
+            cursor.execute(f'INSERT INTO "{self.fts_table}" (rowid, {columns}) SELECT id, {columns} FROM "{self.table}"')
+
+    def connect(self, model):
+        post_save.connect(self._saved, sender=model, weak=False)
+        post_delete.connect(self._deleted, sender=model, weak=False)
+
+    def add(self, instances):
+        """
+        Indexes new rows on SQLite, for writes like bulk_create that skip post_save.
+        """
+        instances = list(instances)
+        if not instances or connections[instances[0]._state.db].vendor != 'sqlite':
+            return
+        columns = ', '.join(self.fields)
+        placeholders = ', '.join(['%s'] * (len(self.fields) + 1))
+        with connections[instances[0]._state.db].cursor() as cursor:
+            cursor.executemany(f'INSERT INTO "{self.fts_table}" (rowid, {columns}) VALUES ({placeholders})',
+                               [[instance.pk, *(getattr(instance, field) for field in self.fields)]
+                                for instance in instances])
+
+    def _saved(self, sender, instance, raw=False, **kwargs):
+        if raw:
+            return
+        self._deleted(sender, instance)
+        self.add([instance])
+
+    def _deleted(self, sender, instance, **kwargs):
+        using = instance._state.db
+        if connections[using].vendor != 'sqlite':
+            return
+        with connections[using].cursor() as cursor:
+            cursor.execute(f'DELETE FROM "{self.fts_table}" WHERE rowid = %s', [instance.pk])
+
+    def search(self, queryset, query):
+        """
+        Filters a queryset of the indexed model down to rows matching every term of the query as a prefix
+        and orders them by an annotated `rank`.
+        """
+        terms = search_terms(query)
+        if not terms:
+            return no_results(queryset)
+
+        if connections[queryset.db].vendor == 'postgresql':
+            tsquery = ' & '.join(f'{term}:*' for term in terms)
+            vector = self._tsvector_sql(f'"{self.table}".')
+            return queryset.alias(
+                search_match=RawSQL(f"({vector}) @@ to_tsquery('{self.config}', %s)", [tsquery],
+                                    output_field=BooleanField())
+            ).filter(search_match=True).annotate(
+                rank=RawSQL(f"-ts_rank(({vector}), to_tsquery('{self.config}', %s))", [tsquery],
+                            output_field=FloatField())
+            ).order_by('rank', 'id')
+
+        return self._match(queryset, ' '.join(f'"{term}"*' for term in terms))
+
+    def is_ranked(self, query):
+        """
+        Whether `search` annotates the results of this query with `rank`.
+        """
+        return True
+
+    def _match(self, queryset, match):
+        """
+        Joins the FTS5 table through `search_entry`, so matching, bm25 ranking, ordering and paging by rank
+        all run in the one query of the queryset.
+        """
+        weights = ', '.join(str(SQLITE_WEIGHTS[weight]) for weight in self.fields.values())
+        return queryset.filter(search_entry__isnull=False).filter(
+            RawSQL(f'"{self.fts_table}" MATCH %s', [match], output_field=BooleanField())
+        ).annotate(
+            rank=RawSQL(f'bm25("{self.fts_table}", {weights})', [], output_field=FloatField())
+        ).order_by('rank', 'id')
+
+    def _matches(self, queryset, match):
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(f'SELECT 1 FROM "{self.fts_table}" WHERE "{self.fts_table}" MATCH %s LIMIT 1', [match])
+            return cursor.fetchone() is not None
+
+
+class TrigramIndex(FullTextIndex):
+    """
+    Substring index over trigrams. On SQLite, queries with no exact substring match retry typo tolerant,
+    see `_fuzzy_match`.
+
+    SQLite: an FTS5 table with the trigram tokenizer, kept in sync like FullTextIndex.
+    PostgreSQL: a pg_trgm GIN expression index queried with word similarity.
+    Queries without a term of at least three characters fall back to an unranked case insensitive prefix match
+    in id order, which stops at the first page of matches.
+    """
+
+    @property
+    def fts_table(self):
+        return f'{self.table}_trgm'
+
+    def _text_sql(self, prefix=''):
+        return "lower(" + " || ' ' || ".join(f'coalesce({prefix}"{field}", \'\')' for field in self.fields) + ")"
+
+    def create(self, schema_editor):
+        columns = ', '.join(self.fields)
+        if schema_editor.connection.vendor == 'sqlite':
+            schema_editor.execute(f'CREATE VIRTUAL TABLE "{self.fts_table}" USING fts5({columns}, tokenize="trigram")')
+            self.rebuild(schema_editor.connection.alias)
+        elif schema_editor.connection.vendor == 'postgresql':
+            schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            schema_editor.execute(
+                f'CREATE INDEX "{self.fts_table}_idx" ON "{self.table}" USING GIN (({self._text_sql()}) gin_trgm_ops)'
+            )
+
+    def search(self, queryset, query):
+        terms = [term.lower() for term in search_terms(query)]
+        if not terms:
+            return no_results(queryset)
+
+        if not self.is_ranked(query):
+            prefix = Q()
+            for term in terms:
+                prefix &= Q(*(Q(**{f'{field}__istartswith': term}) for field in self.fields), _connector=Q.OR)
+            return queryset.filter(prefix)
+
+        terms = [term for term in terms if len(term) >= 3]
+        if connections[queryset.db].vendor == 'postgresql':
+            text = ' '.join(terms)
+            column = self._text_sql(f'"{self.table}".')
+            return queryset.alias(
+                search_match=RawSQL(f'%s <%% ({column})', [text], output_field=BooleanField())
+            ).filter(search_match=True).annotate(
+                rank=RawSQL(f'%s <<-> ({column})', [text], output_field=FloatField())
+            ).order_by('rank', 'id')
+
+        match = ' AND '.join(f'"{term}"' for term in terms)
+        if not self._matches(queryset, match):
+            match = ' AND '.join(f'({self._fuzzy_match(term)})' for term in terms)
+        return self._match(queryset, match)
+
+    def is_ranked(self, query):
+        return any(len(term) >= 3 for term in search_terms(query))
+
+    def _fuzzy_match(self, term):
+        """
+        A typo rarely reaches both ends and the middle of a term, so any of its leading, middle or trailing chunk
+        matching as a substring is enough; exact matches hit every chunk and rank first.
+        """
+        size = max(3, len(term) // 3)
+        chunks = {term[start:start + size] for start in (0, (len(term) - size) // 2, len(term) - size)}
+        return ' OR '.join(f'"{chunk}"' for chunk in chunks)
+
+
+class CombinedIndex:
+    """
+    Ranked full-text index over the same text columns of several models, searched as one for typed hits.
+
+    SQLite: bm25 weighs terms by the statistics of the table it ranks in, so ranks from different FTS5 tables
+    cannot be compared. The models share one FTS5 table instead, whose rowid encodes the model as
+    pk * len(types) + the position of its type, kept in sync from post_save/post_delete.
+    PostgreSQL: ts_rank only depends on the row and the query, so each model's FullTextIndex is searched
+    and the ranks are merged as they are.
+    """
+
+    def __init__(self, table, fields, types):
+        self.table = table
+        self.fields = fields
+        self.types = types
+        self.sources = {}
+        self.hit_types = {}
+
+    def connect(self, hit_type, model, index):
+        self.sources[hit_type] = (model, index)
+        self.hit_types[model] = hit_type
+        post_save.connect(self._saved, sender=model, weak=False)
+        post_delete.connect(self._deleted, sender=model, weak=False)
+
+    def _rowid(self, model, pk):
+        return pk * len(self.types) + self.types.index(self.hit_types[model])
+
+    def add(self, instances):
+        """
+        Indexes new rows on SQLite, for writes like bulk_create that skip post_save.
+        """
+        instances = list(instances)
+        if not instances or connections[instances[0]._state.db].vendor != 'sqlite':
+            return
+        columns = ', '.join(self.fields)
+        placeholders = ', '.join(['%s'] * (len(self.fields) + 1))
+        with connections[instances[0]._state.db].cursor() as cursor:
+            cursor.executemany(f'INSERT INTO "{self.table}" (rowid, {columns}) VALUES ({placeholders})',
+                               [[self._rowid(type(instance), instance.pk),
+                                 *(getattr(instance, field) for field in self.fields)] for instance in instances])
+
+    def _saved(self, sender, instance, raw=False, **kwargs):
+        if raw:
+            return
+        self._deleted(sender, instance)
+        self.add([instance])
+
+    def _deleted(self, sender, instance, **kwargs):
+        using = instance._state.db
+        if connections[using].vendor != 'sqlite':
+            return
+        with connections[using].cursor() as cursor:
+            cursor.execute(f'DELETE FROM "{self.table}" WHERE rowid = %s', [self._rowid(sender, instance.pk)])
+
+    def search(self, query, limit, using='default'):
+        """
+        Returns the `limit` most relevant (type, pk, rank) hits matching every term of the query as a prefix,
+        ranks ascending.
+        """
+        terms = search_terms(query)
+        if not terms:
+            return []
+
+        if connections[using].vendor == 'postgresql':
+            hits = []
+            for hit_type, (model, index) in self.sources.items():
+                ranked = index.search(model._default_manager.using(using), query).values_list('pk', 'rank')[:limit]
+                hits.extend((hit_type, pk, rank) for pk, rank in ranked)
+            return sorted(hits, key=lambda hit: hit[2])[:limit]
+
+        weights = ', '.join(str(SQLITE_WEIGHTS[weight]) for weight in self.fields.values())
+        with connections[using].cursor() as cursor:
+            cursor.execute(f'SELECT rowid, bm25("{self.table}", {weights}) AS score FROM "{self.table}" '
+                           f'WHERE "{self.table}" MATCH %s ORDER BY score, rowid LIMIT %s',
+                           [' '.join(f'"{term}"*' for term in terms), limit])
+            return [(self.types[rowid % len(self.types)], rowid // len(self.types), score)
+                    for rowid, score in cursor.fetchall()]
+
+
+class FullTextSearchFilter(BaseFilterBackend):
+    """
+    Searches the view's `search_index` with the search query parameter and orders results by relevance.
+    Implements `get_ordering`, so cursor pagination pages by rank while a query is given.
+    """
+
+    def get_search_query(self, request):
+        return request.query_params.get(api_settings.SEARCH_PARAM)
+
+    def filter_queryset(self, request, queryset, view):
+        query = self.get_search_query(request)
+        if query is None:
+            return queryset
+        return view.search_index.search(queryset, query)
+
+    def get_ordering(self, request, queryset, view):
+        query = self.get_search_query(request)
+        if query is None or not view.search_index.is_ranked(query):
+            return None
+        return ('rank', 'id')
@@ -0,0 +1,28 @@
+from django.db import transaction
+
+from CorralSnake.images import process_later, process_image
+
+
+class ImageVariantsMixin:
+    """
+    Stores uploaded images as they are and renders their variants in the image worker pool after commit.
+    The upload is stored in the transaction that saves the instance, so its reference is counted under the lock
+    the storage takes for it.
+    `variant_specs` maps each image field to the (kind, sizes) of its variants, kept in <field>_variants.
+    """
+    variant_specs = {}
+
+    def save(self, **kwargs):
+        uploaded = [field for field in self.variant_specs if field in self.validated_data]
+        for field in uploaded:
+            kwargs[f'{field}_variants'] = {}
+        with transaction.atomic():
+            instance = super().save(**kwargs)
+
+        for field in uploaded:
+            file = getattr(instance, field)
+            if file and file.name != file.field.default:
+                process_later(process_image, instance._meta.label, instance.pk, field, file.name,
+                              *self.variant_specs[field])
+
+        return instance
@@ -53,14 +53,15 @@ INSTALLED_APPS = [
 
     'user',
     'article',
-    'quiz'
+    'quiz',
+    'mediastore',
 ]
 
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'user.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
     'SEARCH_PARAM': 'q',
@@ -76,6 +77,10 @@ SIMPLE_JWT = {
     'USER_ID_FIELD': 'public_id'
 }
 
+# How long an authenticated user is served from the cache instead of being loaded for every request.
+# Saving the user drops the entry, which reaches other processes only with a shared CACHE_BACKEND.
+JWT_USER_CACHE_SECONDS = int(os.getenv('JWT_USER_CACHE_SECONDS') or 60)
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -86,11 +91,14 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 
     'corsheaders.middleware.CorsMiddleware',
+    'CorralSnake.replicas.PrimaryPinMiddleware',
 ]
 
 CORS_ALLOWED_ORIGINS = [
     os.getenv('CORS_ADDRESS'),
 ]
+# Lets the front end send back the cookie that pins it to the primary database, see DB_REPLICAS.
+CORS_ALLOW_CREDENTIALS = True
 
 ROOT_URLCONF = 'CorralSnake.urls'
 
@@ -117,20 +125,117 @@ WSGI_APPLICATION = 'CorralSnake.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# DB_ENGINE is 'sqlite3' or 'postgresql'. Connections are kept open for DB_CONN_MAX_AGE seconds (None for unlimited)
+# and checked before reuse. With DB_POOL on Postgres they come from a psycopg pool instead, which checks them
+# on checkout. Django then closes every connection after its request, which returns it to the pool.
+DB_ENGINE = os.getenv('DB_ENGINE') or 'sqlite3'
+DB_CONN_MAX_AGE = os.getenv('DB_CONN_MAX_AGE') or '60'
+DB_POOL = os.getenv('DB_POOL', 'False').lower() in ('true', '1', 't')
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': f'django.db.backends.{DB_ENGINE}',
         'NAME': os.getenv('DB_NAME'),
-        # 'USER': os.getenv('DB_USER'),
-        # 'PASSWORD': os.getenv('DB_PASSWORD'),
-        # 'HOST': os.getenv('DB_HOST'),
-        # 'PORT': os.getenv('DB_PORT'),
+        'CONN_MAX_AGE': None if DB_CONN_MAX_AGE.lower() == 'none' else int(DB_CONN_MAX_AGE),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+if DB_ENGINE == 'sqlite3':
+    # Several gunicorn workers share the file: WAL lets readers run next to the writer, and taking the write lock
+    # when a transaction begins makes writers wait in the busy timeout instead of failing with "database is locked"
+    # when a read lock cannot be upgraded.
+    DATABASES['default']['OPTIONS'] = {
+        'transaction_mode': 'IMMEDIATE',
+        'timeout': int(os.getenv('DB_SQLITE_TIMEOUT') or 20),
+        'init_command': ';'.join([
+            'PRAGMA journal_mode=WAL',
+            'PRAGMA synchronous=NORMAL',
+            f"PRAGMA mmap_size={int(os.getenv('DB_SQLITE_MMAP_SIZE') or 128 * 1024 * 1024)}",
+            f"PRAGMA cache_size=-{int(os.getenv('DB_SQLITE_CACHE_KIB') or 64 * 1024)}",
+            'PRAGMA temp_store=MEMORY',
+        ]),
+    }
+
+if DB_ENGINE == 'postgresql':
+    DATABASES['default'] |= {
+        'USER': os.getenv('DB_USER'),
+        'PASSWORD': os.getenv('DB_PASSWORD'),
+        'HOST': os.getenv('DB_HOST') or 'localhost',
+        'PORT': os.getenv('DB_PORT') or '5432',
+    }
+    if DB_POOL:
+        DATABASES['default'] |= {
+            'CONN_MAX_AGE': 0,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.getenv('DB_POOL_MIN_SIZE') or 2),
+                    'max_size': int(os.getenv('DB_POOL_MAX_SIZE') or 10),
+                    'timeout': int(os.getenv('DB_POOL_TIMEOUT') or 10),
+                },
+            },
+        }
+
+# DB_REPLICAS lists read replicas of the primary, as hosts on Postgres or file names on SQLite. Read-only actions
+# of ReplicaReadMixin views use them, except for users who wrote within the last REPLICA_PIN_SECONDS, which a signed
+# cookie remembers on the client.
+DATABASE_REPLICAS = []
+for index, location in enumerate(filter(None, (os.getenv('DB_REPLICAS') or '').split(',')), start=1):
+    DATABASES[f'replica{index}'] = DATABASES['default'] | {
+        'HOST' if DB_ENGINE == 'postgresql' else 'NAME': location.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{index}')
+
+DATABASE_ROUTERS = ['CorralSnake.replicas.ReplicaRouter']
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS') or 5)
+
 AUTH_USER_MODEL = 'user.User'
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND') or 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': os.getenv('CACHE_LOCATION') or 'default',
+    },
+    'quiz_snapshots': {
+        'BACKEND': os.getenv('QUIZ_SNAPSHOT_CACHE_BACKEND') or 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': os.getenv('QUIZ_SNAPSHOT_CACHE_LOCATION') or 'quiz-snapshots',
+        'TIMEOUT': int(os.getenv('QUIZ_SNAPSHOT_CACHE_TIMEOUT') or 300),
+    },
+}
+
+# Local backends evict by entry count, shared ones (Redis, Memcached) use their own eviction policy.
+if CACHES['quiz_snapshots']['BACKEND'] in ('django.core.cache.backends.locmem.LocMemCache',
+                                           'django.core.cache.backends.filebased.FileBasedCache'):
+    CACHES['quiz_snapshots']['OPTIONS'] = {
+        'MAX_ENTRIES': int(os.getenv('QUIZ_SNAPSHOT_CACHE_MAX_ENTRIES') or 500),
+        'CULL_FREQUENCY': int(os.getenv('QUIZ_SNAPSHOT_CACHE_CULL_FREQUENCY') or 3),
+    }
+
+QUIZ_ANALYTICS_CACHE_TIMEOUT = int(os.getenv('QUIZ_ANALYTICS_CACHE_TIMEOUT') or 60)
+
+# Opt-in write-behind for single answer submissions: a local SQLite file they are queued in before
+# being bulk inserted every SUBMISSION_QUEUE_FLUSH_INTERVAL seconds. 0 leaves flushing to flush_submissions.
+SUBMISSION_QUEUE_PATH = os.getenv('SUBMISSION_QUEUE_PATH') or ''
+SUBMISSION_QUEUE_FLUSH_INTERVAL = float(os.getenv('SUBMISSION_QUEUE_FLUSH_INTERVAL') or 1)
+SUBMISSION_QUEUE_BATCH_SIZE = int(os.getenv('SUBMISSION_QUEUE_BATCH_SIZE') or 500)
+SUBMISSION_QUEUE_CLAIM_TIMEOUT = int(os.getenv('SUBMISSION_QUEUE_CLAIM_TIMEOUT') or 30)
+# How long finishing an attempt waits for its queued answers before answering 503.
+SUBMISSION_QUEUE_FLUSH_TIMEOUT = float(os.getenv('SUBMISSION_QUEUE_FLUSH_TIMEOUT') or 5)
+
+SEARCH_MAX_RESULTS = int(os.getenv('SEARCH_MAX_RESULTS') or 200)
+AUTOCOMPLETE_MAX_RESULTS = int(os.getenv('AUTOCOMPLETE_MAX_RESULTS') or 10)
+AUTOCOMPLETE_STALE_SECONDS = int(os.getenv('AUTOCOMPLETE_STALE_SECONDS') or 5)
+
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS') or 2)
+IMAGE_WORKER_POOL = os.getenv('IMAGE_WORKER_POOL') or 'process'
+IMAGE_WEBP_QUALITY = int(os.getenv('IMAGE_WEBP_QUALITY') or 80)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -174,6 +279,22 @@ STATIC_ROOT = os.path.join(BASE_DIR, "static")
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+STORAGES = {
+    'default': {
+        'BACKEND': os.getenv('MEDIA_STORAGE_BACKEND') or 'mediastore.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+# Media is served by mediastore.views.serve_media. With MEDIA_SENDFILE set to 'x-accel-redirect' (nginx, internal
+# location MEDIA_ACCEL_REDIRECT_LOCATION aliased to MEDIA_ROOT) or 'x-sendfile' (Apache, lighttpd) the front proxy
+# sends the file, otherwise Django streams it with conditional and range request support.
+MEDIA_SENDFILE = os.getenv('MEDIA_SENDFILE') or ''
+MEDIA_ACCEL_REDIRECT_LOCATION = os.getenv('MEDIA_ACCEL_REDIRECT_LOCATION') or '/protected-media/'
+MEDIA_CACHE_MAX_AGE = int(os.getenv('MEDIA_CACHE_MAX_AGE') or 3600)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,15 @@
+from unittest import skipUnless
+
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase
+
+
+@skipUnless(settings.DB_ENGINE == 'postgresql', 'Runs with DB_ENGINE=postgresql, see docker-compose.yml.')
+class PostgresTests(TestCase):
+    def test_database_is_configured_from_the_environment(self):
+        self.assertEqual(connection.vendor, 'postgresql')
+        self.assertEqual(connection.pool is not None, settings.DB_POOL)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            self.assertIsNotNone(cursor.fetchone())
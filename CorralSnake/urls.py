@@ -14,7 +14,8 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.conf.urls.static import static
+import re
+
 from django.contrib import admin
 from django.urls import path, re_path, include
 from rest_framework import permissions
@@ -23,6 +24,8 @@ from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 
 from CorralSnake import settings
+from CorralSnake.views import SearchViewSet
+from mediastore.views import serve_media
 
 urlpatterns = [
     path('auth/token/', TokenObtainPairView.as_view()),
@@ -31,10 +34,10 @@ urlpatterns = [
     path('user/', include('user.urls')),
     path('article/', include('article.urls')),
     path('quiz/', include('quiz.urls')),
+    path('search/', SearchViewSet.as_view({'get': 'list'})),
+    re_path(rf'^{re.escape(settings.MEDIA_URL.lstrip("/"))}(?P<path>.*)$', serve_media),
 ]
 
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
-
 if settings.DEBUG:
     schema_view = get_schema_view(
         openapi.Info(
@@ -13,3 +13,18 @@ def uuid_upload_to(path):
         return os.path.join(path, f'{str(uuid4())}.{extension}')
 
     return uuid_filename
+
+
+def get_limit(request, default, maximum):
+    try:
+        limit = int(request.query_params.get('limit', default))
+    except ValueError:
+        limit = default
+    return max(1, min(limit, maximum))
+
+
+def auto_now_fields(model):
+    """
+    Names of the model's auto_now fields, which a save with update_fields only bumps when they are listed.
+    """
+    return [field.name for field in model._meta.concrete_fields if getattr(field, 'auto_now', False)]
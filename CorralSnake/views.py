@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.db.models import F
+from rest_framework import viewsets, status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from CorralSnake.utils import get_limit
+from article.models import Article
+from quiz.models import Quiz, Question
+from quiz.search import combined_index
+
+
+class SearchViewSet(viewsets.ViewSet):
+    permission_classes = [IsAuthenticated]
+
+    def list(self, request, *args, **kwargs):
+        """
+        Searches articles, quizzes and questions in one combined index and returns the most relevant hits,
+        each with its type and the public IDs of the article and quiz it belongs to.
+        """
+        query = request.query_params.get('q')
+        if query is None:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+
+        limit = get_limit(request, settings.REST_FRAMEWORK['PAGE_SIZE'], settings.SEARCH_MAX_RESULTS)
+        sources = {
+            'article': (Article.objects.all(), {}),
+            'quiz': (Quiz.objects.all(), {'article_public_id': F('article__public_id')}),
+            'question': (Question.objects.all(), {'quiz_public_id': F('quiz__public_id'),
+                                                  'article_public_id': F('quiz__article__public_id')}),
+        }
+
+        ranked = combined_index.search(query, limit)
+        rows = {}
+        for hit_type, (queryset, related) in sources.items():
+            pks = [pk for ranked_type, pk, _ in ranked if ranked_type == hit_type]
+            if pks:
+                for row in queryset.filter(pk__in=pks).values('pk', 'public_id', 'title', **related):
+                    rows[hit_type, row.pop('pk')] = row
+
+        return Response([{'type': hit_type} | rows[hit_type, pk] for hit_type, pk, _ in ranked if (hit_type, pk) in rows])
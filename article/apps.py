@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class ArticleConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'article'
+
+    def ready(self):
+        from article.models import Article
+        from article.search import article_index, article_autocomplete
+        from mediastore.references import track
+
+        article_index.connect(Article)
+        article_autocomplete.connect(Article)
+        track(Article, 'image', 'image_variants')
@@ -0,0 +1,42 @@
+from django.db import migrations
+
+# The DDL is frozen here, so later changes to article.search do not change what this migration does.
+CREATE = {
+    'sqlite': [
+        'CREATE VIRTUAL TABLE "article_article_fts" USING fts5(title, description, '
+        'tokenize="unicode61 remove_diacritics 2")',
+        'INSERT INTO "article_article_fts" (rowid, title, description) '
+        'SELECT id, title, description FROM "article_article"',
+    ],
+    'postgresql': [
+        'CREATE INDEX "article_article_fts_idx" ON "article_article" USING GIN (('
+        "setweight(to_tsvector('simple', coalesce(\"title\", '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(\"description\", '')), 'B')))",
+    ],
+}
+
+DROP = {
+    'sqlite': ['DROP TABLE IF EXISTS "article_article_fts"'],
+    'postgresql': ['DROP INDEX IF EXISTS "article_article_fts_idx"'],
+}
+
+
+def create_search_index(apps, schema_editor):
+    for statement in CREATE.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    for statement in DROP.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('article', '0007_alter_article_image'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
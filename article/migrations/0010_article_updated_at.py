@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 14:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('article', '0009_article_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.1 on 2026-10-18 15:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('article', '0010_article_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArticleSearchEntry',
+            fields=[
+                ('article', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='article.article')),
+            ],
+            options={
+                'db_table': 'article_article_fts',
+                'managed': False,
+            },
+        ),
+    ]
@@ -11,12 +11,20 @@ class Article(models.Model):
     title = models.CharField(max_length=255)
     description = models.TextField(max_length=10000)
     image = models.ImageField(upload_to=uuid_upload_to('article/images'), null=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f'{self.title} - {self.author.email}'
 
-    def delete(self, using=None, keep_parents=False):
-        if self.image.name != self.image.field.default:
-            self.image.delete()
 
-        return super().delete(using, keep_parents)
+class ArticleSearchEntry(models.Model):
+    """
+    A row of the SQLite FTS5 table of article_index, so searches can join it. The table is not managed by Django.
+    """
+    article = models.OneToOneField(Article, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid',
+                                   related_name='search_entry')
+
+    class Meta:
+        managed = False
+        db_table = 'article_article_fts'
@@ -0,0 +1,5 @@
+from CorralSnake.autocomplete import PrefixIndex
+from CorralSnake.search import FullTextIndex
+
+article_index = FullTextIndex('article_article', {'title': 'A', 'description': 'B'})
+article_autocomplete = PrefixIndex(['title'], 'title')
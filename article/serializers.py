@@ -1,5 +1,8 @@
 from rest_framework import serializers
 
+from CorralSnake.fields import ImageVariantsField
+from CorralSnake.images import IMAGE_WIDTHS
+from CorralSnake.serializers import ImageVariantsMixin
 from article.models import Article
 from user.serializers import FriendSerializer
 from django.contrib.auth import get_user_model
@@ -8,7 +11,7 @@ from django.contrib.auth import get_user_model
 User = get_user_model()
 
 
-class ArticleSerializer(serializers.ModelSerializer):
+class ArticleSerializer(ImageVariantsMixin, serializers.ModelSerializer):
     author = FriendSerializer(many=False, read_only=True)
     author_pk = serializers.SlugRelatedField(
         source='author', queryset=User.objects.all(), slug_field='pk', write_only=True
@@ -16,12 +19,16 @@ class ArticleSerializer(serializers.ModelSerializer):
 
     quizzes_public_ids = serializers.SlugRelatedField(many=True, read_only=True, slug_field='public_id', source='quizzes')
 
+    image_variants = ImageVariantsField()
+    variant_specs = {'image': ('width', IMAGE_WIDTHS)}
+
     class Meta:
         model = Article
         fields = ['public_id',
                   'title',
                   'description',
                   'image',
+                  'image_variants',
                   'author',
                   'author_pk',
                   'quizzes_public_ids']
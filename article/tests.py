@@ -1,15 +1,31 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from PIL import Image
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
 
 from article.models import Article
+from article.search import article_autocomplete
 from quiz.models import Quiz, Question, QuestionAnswer
 from user.models import USER_ROLES
 
 User = get_user_model()
 
+MEDIA_ROOT = tempfile.mkdtemp()
+
 
 class ArticleTests(APITestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
     def setUp(self):
         self.user = User.objects.create_superuser(email='admin@admin.com',
                                                   username='testuser',
@@ -67,3 +83,120 @@ class ArticleTests(APITestCase):
         response = self.client.post('/article/', data, format='multipart')
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(Article.objects.count(), 1)
+
+    def test_search_articles_cursor_pagination(self):
+        for index in range(15):
+            Article.objects.create(author=self.user, title=f'title {index}', description='description')
+
+        response = self.client.get('/article/search/?q=title')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertNotIn('count', response.data)
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual([article['title'] for article in response.data['results']],
+                         [f'title {index}' for index in range(10, 15)])
+        self.assertIsNone(response.data['next'])
+
+        response = self.client.get('/article/search/?q=title&page=2')
+        self.assertEqual(response.data['count'], 15)
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_full_text_search_ranks_and_tracks_changes(self):
+        in_description = Article.objects.create(author=self.user, title='Cells', description='Photosynthesis in plants')
+        in_title = Article.objects.create(author=self.user, title='Photosynthesis', description='How plants eat light')
+        Article.objects.create(author=self.user, title='Volcanoes', description='Lava and ash')
+
+        response = self.client.get('/article/search/?q=photosynth')
+        self.assertEqual([article['public_id'] for article in response.data['results']],
+                         [str(in_title.public_id), str(in_description.public_id)])
+
+        in_title.title = 'Leaves'
+        in_title.description = 'Chlorophyll'
+        in_title.save()
+        in_description.delete()
+
+        response = self.client.get('/article/search/?q=photosynthesis')
+        self.assertEqual(response.data['results'], [])
+
+        response = self.client.get('/article/search/?q=chloro leav')
+        self.assertEqual([article['public_id'] for article in response.data['results']], [str(in_title.public_id)])
+
+    def test_autocomplete_articles(self):
+        photosynthesis = Article.objects.create(author=self.user, title='Intro to Photosynthesis', description='description')
+        Article.objects.create(author=self.user, title='Photons', description='description')
+        article_autocomplete.load()
+
+        response = self.client.get('/article/autocomplete/?q=intro pho')
+        self.assertEqual(response.data, [{'public_id': str(photosynthesis.public_id), 'title': 'Intro to Photosynthesis'}])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Article.objects.create(author=self.user, title='Phonetics', description='description')
+            photosynthesis.delete()
+
+        response = self.client.get('/article/autocomplete/?q=PHO&limit=5')
+        self.assertEqual([suggestion['title'] for suggestion in response.data], ['Phonetics', 'Photons'])
+
+        response = self.client.get('/article/autocomplete/?q=pho&limit=1')
+        self.assertEqual(len(response.data), 1)
+
+        version = cache.get(article_autocomplete.version_key)
+        photons = Article.objects.get(title='Photons')
+        photons.description = 'Particles of light'
+        with self.captureOnCommitCallbacks(execute=True):
+            photons.save()
+        self.assertEqual(cache.get(article_autocomplete.version_key), version)
+
+        # A change made by another process is replayed from the shared log instead of reloading the index.
+        version = cache.incr(article_autocomplete.version_key)
+        cache.set(article_autocomplete._change_key(version), (0, ('0', 'Photography', {'photography'})))
+        article_autocomplete.checked_at = 0
+        response = self.client.get('/article/autocomplete/?q=phot&limit=5')
+        self.assertEqual([suggestion['title'] for suggestion in response.data], ['Photography', 'Photons'])
+        self.assertEqual(article_autocomplete.version, version)
+
+    def test_conditional_retrieve(self):
+        article = Article.objects.create(author=self.user, title='Photosynthesis', description='Light')
+
+        response = self.client.get(f'/article/{article.public_id}/')
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/article/{article.public_id}/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        response = self.client.get(f'/article/{article.public_id}/', headers={'If-Modified-Since': last_modified})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Quiz.objects.create(author=self.user, title='Quiz', description='Quiz', article=article)
+        response = self.client.get(f'/article/{article.public_id}/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['quizzes_public_ids']), 1)
+
+        etag = response['ETag']
+        self.user.first_name = 'Ada'
+        self.user.save()
+        response = self.client.get(f'/article/{article.public_id}/', headers={'If-None-Match': etag})
+        self.assertEqual(response.data['author']['first_name'], 'Ada')
+
+    @override_settings(IMAGE_WORKERS=0, MEDIA_ROOT=MEDIA_ROOT)
+    def test_article_image_variants(self):
+        buffer = BytesIO()
+        Image.new('RGB', (1000, 500), 'olive').save(buffer, 'JPEG')
+        data = {
+            "title": "Test",
+            "description": "Test",
+            "image": SimpleUploadedFile('photo.jpg', buffer.getvalue(), content_type='image/jpeg'),
+        }
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/article/', data, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        article = Article.objects.get()
+        self.assertEqual(set(article.image_variants), {'320w', '640w', '1000w'})
+        with article.image.storage.open(article.image_variants['320w']) as variant:
+            self.assertEqual(Image.open(variant).size, (320, 160))
+
+        response = self.client.get(f'/article/{article.public_id}/')
+        self.assertEqual(response.data['image_variants']['640w'],
+                         f"http://testserver/media/{article.image_variants['640w']}")
@@ -9,5 +9,6 @@ urlpatterns = [
                                                       'patch': 'partial_update',
                                                       'delete': 'destroy'})),
 
+    path('autocomplete/', ArticleViewSet.as_view({'get': 'autocomplete'})),
     path('search/', ArticleViewSet.as_view({'get': 'list'})),
 ]
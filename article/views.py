@@ -1,22 +1,31 @@
-from rest_framework import viewsets, status, filters
+from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.decorators import action
+from django.conf import settings
 from django.contrib.auth import get_user_model
 
+from CorralSnake.conditional import ConditionalRetrieveMixin
+from CorralSnake.pagination import KeysetPagination
+from CorralSnake.replicas import ReplicaReadMixin
+from CorralSnake.search import FullTextSearchFilter
+from CorralSnake.utils import get_limit
 from user.permissions import TeacherOnly
 from .models import Article
+from .search import article_index, article_autocomplete
 from .serializers import ArticleSerializer
 
 User = get_user_model()
 
 
-class ArticleViewSet(viewsets.ModelViewSet):
+class ArticleViewSet(ConditionalRetrieveMixin, ReplicaReadMixin, viewsets.ModelViewSet):
     lookup_field = 'public_id'
     queryset = Article.objects.all().order_by('id')
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['title']
+    filter_backends = [FullTextSearchFilter]
+    search_index = article_index
     serializer_class = ArticleSerializer
+    pagination_class = KeysetPagination
+    validator_fields = ['updated_at', 'author__updated_at']
 
     def create(self, request, *args, **kwargs):
         """
@@ -30,7 +39,12 @@ class ArticleViewSet(viewsets.ModelViewSet):
     def retrieve(self, request, *args, **kwargs):
         """
         Retrieves an article by its public ID. Any authenticated user can access this.
+        Answers with 304 when the client's copy is still current.
         """
+        response = self.get_not_modified_response(request)
+        if response is not None:
+            return response
+
         article = self.get_object()
 
         serializer = self.get_serializer(article)
@@ -79,6 +93,19 @@ class ArticleViewSet(viewsets.ModelViewSet):
         self.perform_destroy(article)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(detail=False, methods=['GET'])
+    def autocomplete(self, request, *args, **kwargs):
+        """
+        Suggests article titles with words starting with the typed query, straight from the in-memory prefix index.
+        """
+        query = request.query_params.get('q')
+        if query is None:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+
+        limit = get_limit(request, settings.AUTOCOMPLETE_MAX_RESULTS, settings.AUTOCOMPLETE_MAX_RESULTS)
+        suggestions = article_autocomplete.lookup(query, limit)
+        return Response([{'public_id': public_id, 'title': title} for public_id, title in suggestions])
+
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
             permission_classes = [TeacherOnly]
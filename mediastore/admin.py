@@ -0,0 +1,5 @@
+from django.contrib import admin
+
+from mediastore.models import StoredFile
+
+admin.site.register(StoredFile)
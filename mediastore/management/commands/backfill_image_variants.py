@@ -0,0 +1,73 @@
+from concurrent.futures import wait, FIRST_COMPLETED
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from CorralSnake.images import get_executor, process_image
+from article.serializers import ArticleSerializer
+from quiz.serializers import QuestionSerializer
+from user.serializers import UserSerializer
+
+TARGETS = {
+    'article': ArticleSerializer,
+    'question': QuestionSerializer,
+    'user': UserSerializer,
+}
+
+
+class Command(BaseCommand):
+    help = 'Renders the missing variants of already uploaded article, question and profile images in the image worker pool.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=TARGETS, action='append', help='Limit to these models, all by default.')
+        parser.add_argument('--force', action='store_true', help='Re-render images that already have variants.')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        for target in options['model'] or TARGETS:
+            serializer_class = TARGETS[target]
+            model = serializer_class.Meta.model
+            for field_name, spec in serializer_class.variant_specs.items():
+                field = model._meta.get_field(field_name)
+                queryset = model._default_manager.exclude(**{f'{field_name}__isnull': True}).exclude(**{field_name: ''})
+                if field.default:
+                    queryset = queryset.exclude(**{field_name: field.default})
+                if not options['force']:
+                    queryset = queryset.filter(**{f'{field_name}_variants': {}})
+
+                rows = queryset.order_by('pk').values_list('pk', field_name)
+                done, failed = self.render(model, field_name, spec, rows.iterator(chunk_size=options['batch_size']),
+                                           options['batch_size'])
+                self.stdout.write(f'{model.__name__}.{field_name}: rendered {done}, failed {failed}')
+
+    def render(self, model, field_name, spec, rows, max_pending):
+        done = failed = 0
+        pending = {}
+
+        def collect(futures):
+            nonlocal done, failed
+            for future in futures:
+                pk = pending.pop(future)
+                if future.exception() is None:
+                    done += 1
+                else:
+                    failed += 1
+                    self.stderr.write(f'{model.__name__} {pk}: {future.exception()}')
+
+        for pk, name in rows:
+            args = (model._meta.label, pk, field_name, name, *spec)
+            if settings.IMAGE_WORKERS == 0:
+                try:
+                    process_image(*args)
+                    done += 1
+                except Exception as exception:
+                    failed += 1
+                    self.stderr.write(f'{model.__name__} {pk}: {exception}')
+                continue
+
+            pending[get_executor().submit(process_image, *args)] = pk
+            if len(pending) >= max_pending:
+                collect(wait(pending, return_when=FIRST_COMPLETED).done)
+        collect(list(pending))
+
+        return done, failed
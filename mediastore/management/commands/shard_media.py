@@ -0,0 +1,78 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from CorralSnake.utils import auto_now_fields
+from mediastore.references import TRACKED, discard, lock
+from mediastore.storage import ContentAddressedStorage
+
+
+class Command(BaseCommand):
+    help = 'Moves already stored images and their variants into the sharded layout and rewrites their paths. ' \
+           'Rows that are already sharded are skipped, so an interrupted run can simply be started again.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        for model, file_field, variants_field in TRACKED:
+            field = model._meta.get_field(file_field)
+            if not isinstance(field.storage, ContentAddressedStorage):
+                raise CommandError(f'{model.__name__}.{file_field} is not stored in a ContentAddressedStorage.')
+
+            moved = missing = 0
+            last_pk = None
+            while True:
+                rows = model._default_manager.order_by('pk').values_list('pk', file_field, variants_field)
+                if last_pk is not None:
+                    rows = rows.filter(pk__gt=last_pk)
+                batch = list(rows[:options['batch_size']])
+                if not batch:
+                    break
+                last_pk = batch[-1][0]
+
+                for pk, name, variants in batch:
+                    result = self.move(model, field, variants_field, pk, name, variants or {})
+                    moved += result == 'moved'
+                    missing += result == 'missing'
+                self.stdout.write(f'{model.__name__}.{file_field}: up to pk {last_pk}, moved {moved}')
+
+            self.stdout.write(f'{model.__name__}.{file_field}: moved {moved}, missing {missing}')
+
+    def move(self, model, field, variants_field, pk, name, variants):
+        storage = field.storage
+        names = [*variants.values()]
+        if name and name != field.default:
+            names.append(name)
+        if all(storage.is_sharded(old) for old in names):
+            return None
+        if not all(storage.is_sharded(old) or storage.exists(old) for old in names):
+            self.stderr.write(f'{model.__name__} {pk}: missing files, skipped')
+            return 'missing'
+
+        # Copy before locking the row, hashing large files must not hold the lock.
+        new_names = {}
+        for old in names:
+            if storage.is_sharded(old):
+                new_names[old] = old
+            else:
+                with storage.open(old) as file:
+                    new_names[old] = storage.save(old, file)
+
+        with transaction.atomic():
+            instance = model._default_manager.select_for_update().filter(pk=pk, **{field.name: name}).first()
+            if instance is not None and (getattr(instance, variants_field) or {}) == variants:
+                # A copy that matched a file a concurrent delete removed since is stored again under the lock.
+                lock(new_names.values())
+                for old, new in new_names.items():
+                    if not storage.exists(new):
+                        with storage.open(old) as file:
+                            storage.save(old, file)
+                if name in new_names:
+                    getattr(instance, field.name).name = new_names[name]
+                setattr(instance, variants_field, {variant: new_names[old] for variant, old in variants.items()})
+                instance.save(update_fields=[field.name, variants_field, *auto_now_fields(model)])
+                return 'moved'
+
+        # Changed while copying, the new upload is sharded already.
+        discard(storage, set(new_names.values()) - set(names))
+        return None
@@ -0,0 +1,13 @@
+from django.db import models
+
+
+class StoredFile(models.Model):
+    """
+    How many file and variant fields reference a stored file. Files without a row predate
+    reference counting and belong to a single field.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    references = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.name} ({self.references})'
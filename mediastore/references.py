@@ -0,0 +1,121 @@
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.db.models.signals import pre_save, post_save, post_delete
+
+from mediastore.models import StoredFile
+
+# (model, file field, variants field) of every tracked image.
+TRACKED = []
+
+
+def _by_count(counts):
+    groups = defaultdict(list)
+    for name, count in counts.items():
+        groups[count].append(name)
+    return groups.items()
+
+
+def lock(names):
+    """
+    Locks the rows of the given stored files until the current transaction ends, creating the missing ones,
+    and returns their reference counts. Storing a file and deleting it take this lock, so a file is never
+    deleted between an upload finding it on disk and the upload's reference being counted.
+    """
+    StoredFile.objects.bulk_create([StoredFile(name=name) for name in names], ignore_conflicts=True)
+    return dict(StoredFile.objects.select_for_update().filter(name__in=names).values_list('name', 'references'))
+
+
+def acquire(names):
+    counts = Counter(names)
+    if not counts:
+        return
+    StoredFile.objects.bulk_create([StoredFile(name=name) for name in counts], ignore_conflicts=True)
+    for count, group in _by_count(counts):
+        StoredFile.objects.filter(name__in=group).update(references=F('references') + count)
+
+
+def release(storage, names):
+    """
+    Drops references to stored files and deletes the files nothing references anymore once the transaction commits.
+    """
+    counts = Counter(names)
+    if not counts:
+        return
+    for count, group in _by_count(counts):
+        StoredFile.objects.filter(name__in=group).update(references=Greatest(F('references') - count, Value(0)))
+    discard(storage, counts)
+
+
+def discard(storage, names):
+    """
+    Deletes the given files after commit unless something references them by then, e.g. files rendered for
+    an object that changed in the meantime, whose content may still be shared with other objects.
+    """
+    names = set(names)
+    if not names:
+        return
+
+    def delete_unreferenced():
+        with transaction.atomic():
+            references = lock(names)
+            unreferenced = [name for name in names if not references.get(name)]
+            StoredFile.objects.filter(name__in=unreferenced).delete()
+            for name in unreferenced:
+                storage.delete(name)
+
+    transaction.on_commit(delete_unreferenced)
+
+
+def track(model, file_field, variants_field):
+    """
+    Counts the references a model holds through an image field and the variants map next to it.
+    Saving diffs the stored names against the row as it was before, deleting releases them.
+    """
+    default = model._meta.get_field(file_field).default
+    storage = model._meta.get_field(file_field).storage
+    tracked = (file_field, variants_field)
+    TRACKED.append((model, file_field, variants_field))
+
+    def names(values):
+        result = []
+        if file_field in values:
+            name = values[file_field]
+            result += [name] if name and name != default else []
+        if variants_field in values:
+            result += (values[variants_field] or {}).values()
+        return Counter(result)
+
+    def current(instance, fields):
+        values = {field: getattr(instance, field) for field in fields}
+        if file_field in values:
+            values[file_field] = values[file_field].name
+        return names(values)
+
+    def fields_of(update_fields):
+        return [field for field in tracked if update_fields is None or field in update_fields]
+
+    def saving(sender, instance, raw=False, update_fields=None, **kwargs):
+        instance._stored_files = Counter()
+        fields = fields_of(update_fields)
+        if raw or instance._state.adding or not fields:
+            return
+        row = sender._default_manager.filter(pk=instance.pk).values(*fields).first()
+        instance._stored_files = names(row or {})
+
+    def saved(sender, instance, raw=False, update_fields=None, **kwargs):
+        if raw:
+            return
+        previous = instance.__dict__.pop('_stored_files', Counter())
+        now = current(instance, fields_of(update_fields))
+        acquire((now - previous).elements())
+        release(storage, (previous - now).elements())
+
+    def deleted(sender, instance, **kwargs):
+        release(storage, current(instance, tracked).elements())
+
+    pre_save.connect(saving, sender=model, weak=False)
+    post_save.connect(saved, sender=model, weak=False)
+    post_delete.connect(deleted, sender=model, weak=False)
@@ -0,0 +1,77 @@
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+
+from mediastore.references import lock
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stores every file under the SHA-256 of its content, keeping the directory and extension of the name it is
+    saved under, so identical uploads share one file. The content is hashed while it streams into a temporary
+    file, which is then renamed into place or dropped when the content is already stored. That check runs under
+    the lock of the file's StoredFile row, which deletes take too; saving in the transaction that counts the
+    reference keeps the file from being deleted before the reference is counted.
+
+    Files fan out below their directory into `shard_depth` levels of two hex digits of the hash,
+    e.g. article/images/3f/a2/3fa2….jpg, so no single directory grows past a few thousand entries.
+    """
+    shard_depth = 2
+
+    def sharded_name(self, directory, digest, extension):
+        shards = [digest[level * 2:level * 2 + 2] for level in range(self.shard_depth)]
+        return posixpath.join(directory, *shards, digest + extension.lower())
+
+    def is_sharded(self, name):
+        *directories, filename = name.split('/')
+        shards = directories[len(directories) - self.shard_depth:]
+        return (len(shards) == self.shard_depth and all(len(shard) == 2 for shard in shards)
+                and filename.startswith(''.join(shards)))
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _makedirs(self, directory):
+        if self.directory_permissions_mode is not None:
+            old_umask = os.umask(0o777 & ~self.directory_permissions_mode)
+            try:
+                os.makedirs(directory, self.directory_permissions_mode, exist_ok=True)
+            finally:
+                os.umask(old_umask)
+        else:
+            os.makedirs(directory, exist_ok=True)
+
+    def _save(self, name, content):
+        name = name.replace('\\', '/')
+        directory = posixpath.dirname(name)
+        # The temporary file stays on the same filesystem as its destination, so the rename is atomic.
+        self._makedirs(self.path(directory))
+
+        digest = hashlib.sha256()
+        fd, temporary = tempfile.mkstemp(dir=self.path(directory), prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    file.write(chunk)
+
+            name = self.sharded_name(directory, digest.hexdigest(), posixpath.splitext(name)[1])
+            self._makedirs(os.path.dirname(self.path(name)))
+            with transaction.atomic():
+                lock([name])
+                if os.path.exists(self.path(name)):
+                    os.remove(temporary)
+                else:
+                    if self.file_permissions_mode is not None:
+                        os.chmod(temporary, self.file_permissions_mode)
+                    os.replace(temporary, self.path(name))
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+
+        return name
@@ -0,0 +1,186 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from PIL import Image
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import override_settings, TestCase
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from article.models import Article
+from mediastore.models import StoredFile
+from quiz.cache import get_quiz_version
+from quiz.models import Quiz, Question
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(IMAGE_WORKERS=0, MEDIA_ROOT=MEDIA_ROOT)
+class MediaStoreTests(APITestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = User.objects.create_superuser(email='admin@admin.com',
+                                                  username='testuser',
+                                                  password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        buffer = BytesIO()
+        Image.new('RGB', (800, 400), 'teal').save(buffer, 'JPEG')
+        self.image = buffer.getvalue()
+
+    def create_article(self, filename):
+        data = {
+            "title": "Test",
+            "description": "Test",
+            "image": SimpleUploadedFile(filename, self.image, content_type='image/jpeg'),
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/article/', data, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return Article.objects.get(public_id=response.data['public_id'])
+
+    def test_identical_uploads_share_files_until_the_last_reference_is_gone(self):
+        first = self.create_article('first.jpg')
+        second = self.create_article('second.JPG')
+
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(first.image_variants, second.image_variants)
+        names = [first.image.name, *first.image_variants.values()]
+        self.assertEqual(set(StoredFile.objects.values_list('name', 'references')), {(name, 2) for name in names})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(all(os.path.exists(os.path.join(MEDIA_ROOT, name)) for name in names))
+        self.assertEqual(set(StoredFile.objects.values_list('references', flat=True)), {1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Article.objects.get(pk=second.pk).delete()
+        self.assertFalse(any(os.path.exists(os.path.join(MEDIA_ROOT, name)) for name in names))
+        self.assertFalse(StoredFile.objects.exists())
+
+    def test_replacing_an_image_releases_the_previous_one(self):
+        article = self.create_article('first.jpg')
+        previous = [article.image.name, *article.image_variants.values()]
+
+        buffer = BytesIO()
+        Image.new('RGB', (800, 400), 'coral').save(buffer, 'JPEG')
+        data = {"image": SimpleUploadedFile('other.jpg', buffer.getvalue(), content_type='image/jpeg')}
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f'/article/{article.public_id}/', data, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        article.refresh_from_db()
+        self.assertFalse(any(os.path.exists(os.path.join(MEDIA_ROOT, name)) for name in previous))
+        self.assertEqual(set(StoredFile.objects.values_list('name', flat=True)),
+                         {article.image.name, *article.image_variants.values()})
+
+    def test_uploads_are_sharded_by_hash(self):
+        article = self.create_article('first.jpg')
+
+        directory, first, second, filename = article.image.name.rsplit('/', 3)
+        self.assertEqual(directory, 'article/images')
+        self.assertEqual(filename[:4], first + second)
+        self.assertTrue(all(name.startswith('article/images/') and article.image.storage.is_sharded(name)
+                            for name in article.image_variants.values()))
+
+    def test_shard_media_moves_flat_files(self):
+        os.makedirs(os.path.join(MEDIA_ROOT, 'article/images'), exist_ok=True)
+        for name, content in [('legacy.jpg', self.image), ('legacy_320w.webp', b'variant')]:
+            with open(os.path.join(MEDIA_ROOT, 'article/images', name), 'wb') as file:
+                file.write(content)
+        article = Article.objects.create(author=self.user, title='Legacy', description='Legacy',
+                                         image='article/images/legacy.jpg',
+                                         image_variants={'320w': 'article/images/legacy_320w.webp'})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('shard_media', stdout=StringIO())
+        article.refresh_from_db()
+
+        storage = article.image.storage
+        names = [article.image.name, article.image_variants['320w']]
+        self.assertTrue(all(storage.is_sharded(name) and storage.exists(name) for name in names))
+        self.assertFalse(os.path.exists(os.path.join(MEDIA_ROOT, 'article/images/legacy.jpg')))
+        self.assertFalse(os.path.exists(os.path.join(MEDIA_ROOT, 'article/images/legacy_320w.webp')))
+        self.assertEqual(set(StoredFile.objects.values_list('name', flat=True)), set(names))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('shard_media', stdout=StringIO())
+        article.refresh_from_db()
+        self.assertEqual([article.image.name, article.image_variants['320w']], names)
+
+    def test_backfill_image_variants(self):
+        article = Article.objects.create(author=self.user, title='title', description='description')
+        quiz = Quiz.objects.create(author=self.user, title='title', description='description', article=article)
+        question = Question.objects.create(quiz=quiz, title='Quiz', description='Quiz desc', question_type='O')
+        buffer = BytesIO()
+        Image.new('RGB', (800, 800), 'navy').save(buffer, 'PNG')
+        question.image.save('diagram.png', ContentFile(buffer.getvalue()))
+        version = get_quiz_version(quiz.public_id)
+
+        out = StringIO()
+        call_command('backfill_image_variants', '--model', 'question', stdout=out)
+        self.assertIn('Question.image: rendered 1, failed 0', out.getvalue())
+        question.refresh_from_db()
+        self.assertEqual(set(question.image_variants), {'320w', '640w', '800w'})
+        # The variants are saved through post_save, which moves the cached quiz on.
+        self.assertNotEqual(get_quiz_version(quiz.public_id), version)
+
+        out = StringIO()
+        call_command('backfill_image_variants', '--model', 'question', stdout=out)
+        self.assertIn('Question.image: rendered 0, failed 0', out.getvalue())
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, MEDIA_SENDFILE='')
+class MediaServingTests(TestCase):
+    name = f'article/images/ab/cd/abcd{"0" * 60}.jpg'
+
+    def setUp(self):
+        os.makedirs(os.path.join(MEDIA_ROOT, 'article/images/ab/cd'), exist_ok=True)
+        with open(os.path.join(MEDIA_ROOT, self.name), 'wb') as file:
+            file.write(b'0123456789')
+
+    def test_serves_files_with_validators_and_long_caching(self):
+        response = self.client.get(f'/media/{self.name}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertIn('immutable', response['Cache-Control'])
+
+        response = self.client.get(f'/media/{self.name}', headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+        self.assertEqual(self.client.get('/media/article/images/missing.jpg').status_code, 404)
+        self.assertEqual(self.client.get('/media/%2E%2E/manage.py').status_code, 404)
+
+    def test_range_requests(self):
+        response = self.client.get(f'/media/{self.name}', headers={'Range': 'bytes=2-5'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+
+        response = self.client.get(f'/media/{self.name}', headers={'Range': 'bytes=-3'})
+        self.assertEqual(b''.join(response.streaming_content), b'789')
+
+        response = self.client.get(f'/media/{self.name}', headers={'Range': 'bytes=20-'})
+        self.assertEqual(response.status_code, 416)
+
+        response = self.client.get(f'/media/{self.name}', headers={'Range': 'bytes=2-5', 'If-Range': '"stale"'})
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(MEDIA_SENDFILE='x-accel-redirect', MEDIA_ACCEL_REDIRECT_LOCATION='/protected-media/')
+    def test_hands_off_to_the_proxy(self):
+        response = self.client.get(f'/media/{self.name}')
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.name}')
+        self.assertEqual(response.content, b'')
@@ -0,0 +1,119 @@
+import mimetypes
+import os
+import posixpath
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import Http404, HttpResponse, FileResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+# Content hashes and UUIDs, optionally followed by a variant suffix: the content behind such a name never changes.
+IMMUTABLE_NAME_RE = re.compile(r'^([0-9a-f]{64}|[0-9a-f]{8}(-[0-9a-f]{4}){3}-[0-9a-f]{12})(_\w+)?\.\w+$')
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+CHUNK_SIZE = 64 * 1024
+
+
+def _parse_range(header, size):
+    """
+    The inclusive (start, end) of a single byte range. Malformed and multi-range headers give None,
+    which means the whole file is sent.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        # The last N bytes, none at all for a zero suffix, which is unsatisfiable.
+        return (max(size - int(last), 0) if int(last) else size), size - 1
+    if last and int(last) < int(first):
+        return None
+    return int(first), (min(int(last), size - 1) if last else size - 1)
+
+
+def _read(path, start, length):
+    with open(path, 'rb') as file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _stream(request, path, stat, etag, last_modified):
+    size = stat.st_size
+    byte_range = None
+    if 'HTTP_RANGE' in request.META:
+        if_range = request.META.get('HTTP_IF_RANGE')
+        if if_range is None or if_range in (etag, last_modified):
+            byte_range = _parse_range(request.META['HTTP_RANGE'], size)
+
+    if byte_range is None:
+        response = FileResponse(open(path, 'rb'))
+    else:
+        start, end = byte_range
+        if start >= size or start > end:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        response = StreamingHttpResponse(_read(path, start, end - start + 1), status=206)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = end - start + 1
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def _send_by_proxy(name, path):
+    response = HttpResponse()
+    if settings.MEDIA_SENDFILE == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_REDIRECT_LOCATION.rstrip('/') + '/' + quote(name)
+    else:
+        response['X-Sendfile'] = path
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Serves a file from MEDIA_ROOT. The transfer is handed off to the front proxy when MEDIA_SENDFILE is set,
+    otherwise the file is streamed here, answering conditional requests with 304 and range requests with 206.
+    Files named by content hash or UUID never change and are cached for a year.
+    """
+    name = posixpath.normpath(path).lstrip('/')
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, name)
+        stat = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    last_modified = http_date(stat.st_mtime)
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is None:
+        if settings.MEDIA_SENDFILE:
+            response = _send_by_proxy(name, full_path)
+        else:
+            response = _stream(request, full_path, stat, etag, last_modified)
+        if response.status_code == 416:
+            return response
+        content_type, encoding = mimetypes.guess_type(full_path)
+        response['Content-Type'] = content_type or 'application/octet-stream'
+        if encoding:
+            response['Content-Encoding'] = encoding
+
+    response['ETag'] = etag
+    response['Last-Modified'] = last_modified
+    if IMMUTABLE_NAME_RE.match(posixpath.basename(name)):
+        patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=settings.MEDIA_CACHE_MAX_AGE)
+    return response
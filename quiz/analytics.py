@@ -0,0 +1,52 @@
+from collections import Counter
+
+from django.db.models import Count
+
+from quiz.grading import normalize_open_answer
+from quiz.models import Question, QuestionAnswer, SubmittedAnswer
+
+
+def answer_distribution(quiz, top_open_answers=10):
+    """
+    Computes how a quiz was answered with grouped queries, whatever the number of submissions:
+    submissions per question, picks per possible answer and the most common open answers per question.
+    Open answers are grouped the way grading compares them, ignoring case and repeated or surrounding whitespace.
+    """
+    submissions = dict(
+        SubmittedAnswer.objects.filter(question__quiz=quiz).order_by()
+        .values('question_id').annotate(count=Count('id')).values_list('question_id', 'count')
+    )
+
+    options = {}
+    for question_id, public_id, value, count in QuestionAnswer.objects.filter(question__quiz=quiz).annotate(
+            count=Count('submitted_answers')).order_by('question_id', 'order', 'id').values_list(
+            'question_id', 'public_id', 'value', 'count'):
+        options.setdefault(question_id, []).append({'public_id': public_id, 'value': value, 'count': count})
+
+    # Grouped the way grading compares open answers, which SQL cannot express portably. Only the counts of
+    # distinct answers are held, the answers themselves are streamed.
+    counts = {}
+    for question_id, answer in SubmittedAnswer.objects.filter(
+            question__quiz=quiz, question__question_type='O', answer__isnull=False
+    ).order_by().values_list('question_id', 'answer').iterator():
+        question_counts = counts.setdefault(question_id, Counter())
+        question_counts[normalize_open_answer(answer)] += 1
+    open_answers = {
+        question_id: [
+            {'answer': answer, 'count': count}
+            for answer, count in sorted(question_counts.items(), key=lambda item: (-item[1], item[0]))[:top_open_answers]
+        ]
+        for question_id, question_counts in counts.items()
+    }
+
+    return [
+        {
+            'question_public_id': public_id,
+            'question_type': question_type,
+            'submissions': submissions.get(question_id, 0),
+            'options': options.get(question_id, []),
+            'open_answers': open_answers.get(question_id, []),
+        }
+        for question_id, public_id, question_type in Question.objects.filter(quiz=quiz).order_by(
+            'order', 'id').values_list('id', 'public_id', 'question_type')
+    ]
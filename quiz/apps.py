@@ -4,3 +4,18 @@ from django.apps import AppConfig
 class QuizConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'quiz'
+
+    def ready(self):
+        from quiz import signals  # noqa: F401
+        from article.models import Article
+        from article.search import article_index
+        from quiz.models import Quiz, Question
+        from quiz.search import quiz_index, question_index, combined_index
+        from mediastore.references import track
+
+        quiz_index.connect(Quiz)
+        question_index.connect(Question)
+        combined_index.connect('article', Article, article_index)
+        combined_index.connect('quiz', Quiz, quiz_index)
+        combined_index.connect('question', Question, question_index)
+        track(Question, 'image', 'image_variants')
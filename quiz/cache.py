@@ -0,0 +1,85 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+SNAPSHOT_CACHE_ALIAS = 'quiz_snapshots'
+
+
+def _version_key(public_id):
+    return f'quiz:{public_id}:version'
+
+
+def _snapshot_key(public_id, version, base_url):
+    return f'quiz:{public_id}:snapshot:{version}:{base_url}'
+
+
+def _answer_key_key(public_id, version):
+    return f'quiz:{public_id}:answer-key:{version}'
+
+
+def _analytics_key(public_id, version):
+    return f'quiz:{public_id}:analytics:{version}'
+
+
+def get_quiz_version(public_id):
+    """
+    Returns the current version stamp of a quiz.
+    A stamp that was never set or got evicted is initialised from the clock,
+    so it can never collide with a stamp that older snapshots were stored under.
+    """
+    cache = caches[SNAPSHOT_CACHE_ALIAS]
+    key = _version_key(public_id)
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_quiz_version(public_id):
+    """
+    Moves a quiz to a new version stamp, which makes every stored snapshot of it unreachable.
+    """
+    cache = caches[SNAPSHOT_CACHE_ALIAS]
+    key = _version_key(public_id)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = time.time_ns()
+        cache.set(key, version, timeout=None)
+        return version
+
+
+def get_quiz_snapshot(public_id, version, base_url):
+    return caches[SNAPSHOT_CACHE_ALIAS].get(_snapshot_key(public_id, version, base_url))
+
+
+def set_quiz_snapshot(public_id, version, base_url, data):
+    """
+    Stores serialized quiz data under the version read before it was built.
+    If the quiz changed in the meantime the snapshot lands under a stale stamp and is never served.
+    Snapshots contain absolute media URLs, hence the base URL in the key.
+    """
+    caches[SNAPSHOT_CACHE_ALIAS].set(_snapshot_key(public_id, version, base_url), data)
+
+
+def get_quiz_answer_key(public_id, version):
+    return caches[SNAPSHOT_CACHE_ALIAS].get(_answer_key_key(public_id, version))
+
+
+def set_quiz_answer_key(public_id, version, answer_key):
+    caches[SNAPSHOT_CACHE_ALIAS].set(_answer_key_key(public_id, version), answer_key)
+
+
+def get_quiz_analytics(public_id, version):
+    return caches[SNAPSHOT_CACHE_ALIAS].get(_analytics_key(public_id, version))
+
+
+def set_quiz_analytics(public_id, version, analytics):
+    """
+    Submissions do not bump the quiz version, so analytics expire after their own, usually shorter, timeout.
+    """
+    caches[SNAPSHOT_CACHE_ALIAS].set(_analytics_key(public_id, version), analytics,
+                                     timeout=settings.QUIZ_ANALYTICS_CACHE_TIMEOUT)
@@ -0,0 +1,45 @@
+from collections import Counter, defaultdict
+
+from django.db.models import F
+
+from quiz.models import QuizSubmissionCounter, QuestionSubmissionCounter, QuestionAnswerSubmissionCounter
+
+
+def _apply(model, deltas):
+    """
+    Adds deltas to counter rows with one UPDATE per distinct delta.
+    Rows that do not exist yet are inserted at zero first, ignoring conflicts with concurrent inserts,
+    so no increment is lost when two requests create the same counter. Decrements never insert rows,
+    a missing row belongs to an object that is being deleted.
+    """
+    pks_by_delta = defaultdict(list)
+    for pk, delta in deltas.items():
+        if delta:
+            pks_by_delta[delta].append(pk)
+
+    for delta, pks in pks_by_delta.items():
+        updated = model.objects.filter(pk__in=pks).update(submissions=F('submissions') + delta)
+        if updated == len(pks) or delta < 0:
+            continue
+
+        missing = set(pks) - set(model.objects.filter(pk__in=pks).values_list('pk', flat=True))
+        model.objects.bulk_create([model(pk=pk) for pk in missing], ignore_conflicts=True)
+        model.objects.filter(pk__in=missing).update(submissions=F('submissions') + delta)
+
+
+def count_submissions(submissions, delta=1):
+    """
+    Updates quiz, question and possible answer counters for (quiz pk, question pk, possible answer pks) rows.
+    Call it inside the transaction that creates (delta=1) or changes the submitted answers,
+    deletes are uncounted by a pre_delete receiver.
+    """
+    quizzes, questions, question_answers = Counter(), Counter(), Counter()
+    for quiz_id, question_id, question_answer_ids in submissions:
+        quizzes[quiz_id] += delta
+        questions[question_id] += delta
+        for question_answer_id in question_answer_ids:
+            question_answers[question_answer_id] += delta
+
+    _apply(QuizSubmissionCounter, quizzes)
+    _apply(QuestionSubmissionCounter, questions)
+    _apply(QuestionAnswerSubmissionCounter, question_answers)
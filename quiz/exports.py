@@ -0,0 +1,89 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+
+from quiz.grading import AnswerKey
+from quiz.models import SubmittedAnswer, QuestionAnswer
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+EXPORT_FIELDS = [
+    'public_id',
+    'attempt_public_id',
+    'username',
+    'started_at',
+    'finished_at',
+    'question_public_id',
+    'question_title',
+    'answer',
+    'question_answers',
+    'correct',
+]
+
+
+def submission_rows(quiz, chunk_size=2000):
+    """
+    Yields one dict per submitted answer of a quiz. Rows are read through a server-side cursor
+    chunk_size at a time, with the picked possible answers prefetched per chunk, so memory use stays flat.
+    """
+    answer_key = AnswerKey.for_quiz(quiz.public_id)
+    submitted_answers = SubmittedAnswer.objects.filter(question__quiz=quiz).select_related(
+        'question', 'attempt__user'
+    ).only(
+        'public_id', 'answer', 'question__public_id', 'question__title',
+        'attempt__public_id', 'attempt__started_at', 'attempt__finished_at', 'attempt__user__username'
+    ).prefetch_related(
+        Prefetch('question_answers', queryset=QuestionAnswer.objects.only('id', 'value').order_by('order', 'id'))
+    ).order_by('id')
+
+    for submitted_answer in submitted_answers.iterator(chunk_size=chunk_size):
+        attempt = submitted_answer.attempt
+        question_answers = submitted_answer.question_answers.all()
+        yield {
+            'public_id': submitted_answer.public_id,
+            'attempt_public_id': attempt.public_id if attempt else None,
+            'username': attempt.user.username if attempt else None,
+            'started_at': attempt.started_at if attempt else None,
+            'finished_at': attempt.finished_at if attempt else None,
+            'question_public_id': submitted_answer.question.public_id,
+            'question_title': submitted_answer.question.title,
+            'answer': submitted_answer.answer,
+            'question_answers': [question_answer.value for question_answer in question_answers],
+            'correct': answer_key.is_correct(submitted_answer.question_id,
+                                             submitted_answer.answer,
+                                             [question_answer.pk for question_answer in question_answers]),
+        }
+
+
+class _Echo:
+    """
+    File-like object whose write returns the line, so csv.writer output can be streamed.
+    """
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        yield writer.writerow([
+            '; '.join(str(value) for value in row[field]) if field == 'question_answers' else row[field]
+            for field in EXPORT_FIELDS
+        ])
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+
+def export_lines(quiz, export_format, chunk_size=2000):
+    rows = submission_rows(quiz, chunk_size)
+    return csv_lines(rows) if export_format == 'csv' else ndjson_lines(rows)
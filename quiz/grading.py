@@ -0,0 +1,149 @@
+from quiz.cache import get_quiz_version, get_quiz_answer_key, set_quiz_answer_key
+from quiz.models import Question, SubmittedAnswer
+
+
+def normalize_open_answer(value):
+    return ' '.join(str(value or '').split()).casefold()
+
+
+class AnswerKey:
+    """
+    Compact answer key of a quiz: question pk -> (public_id, type, correct possible answer pks, normalized open answer).
+    Built with two queries and cached under the quiz version, so any change to the quiz's questions invalidates it.
+    """
+
+    def __init__(self, questions):
+        self.questions = questions
+
+    @classmethod
+    def for_quiz(cls, public_id):
+        version = get_quiz_version(public_id)
+        answer_key = get_quiz_answer_key(public_id, version)
+        if answer_key is None:
+            answer_key = cls.build(public_id)
+            set_quiz_answer_key(public_id, version, answer_key)
+        return answer_key
+
+    @classmethod
+    def build(cls, public_id):
+        correct_answers = {}
+        for question_id, question_answer_id in Question.question_answers.through.objects.filter(
+                question__quiz__public_id=public_id).values_list('question_id', 'questionanswer_id'):
+            correct_answers.setdefault(question_id, set()).add(question_answer_id)
+
+        return cls({
+            question_id: (question_public_id,
+                          question_type,
+                          frozenset(correct_answers.get(question_id, ())),
+                          normalize_open_answer(answer))
+            for question_id, question_public_id, question_type, answer in Question.objects.filter(
+                quiz__public_id=public_id).values_list('id', 'public_id', 'question_type', 'answer')
+        })
+
+    @property
+    def max_score(self):
+        """
+        The number of questions with a key to grade against, which is what one attempt can score at most.
+        """
+        return sum(bool(open_answer) if question_type == 'O' else bool(correct_answers)
+                   for public_id, question_type, correct_answers, open_answer in self.questions.values())
+
+    def is_correct(self, question_id, answer, question_answer_ids):
+        """
+        Returns whether a submission is correct, or None if the question is unknown or has no key to grade against.
+        Single and multiple choice answers must select exactly the correct possible answers.
+        """
+        if question_id not in self.questions:
+            return None
+
+        public_id, question_type, correct_answers, open_answer = self.questions[question_id]
+        if question_type == 'O':
+            return normalize_open_answer(answer) == open_answer if open_answer else None
+        return frozenset(question_answer_ids) == correct_answers if correct_answers else None
+
+
+class GradingResult:
+    """
+    Scores of graded answers. Every gradable question of the key counts towards the maximum of each attempt,
+    answered or not. Answers without an attempt count as one more attempt.
+    """
+
+    def __init__(self, answer_key, attempt_public_ids=()):
+        self.answer_key = answer_key
+        self.answers = {}
+        self.questions = {question_id: {'submitted': 0, 'correct': 0} for question_id in answer_key.questions}
+        self.sittings = set()
+        self.attempts = {}
+        for attempt_public_id in attempt_public_ids:
+            self._sit(attempt_public_id)
+
+    @property
+    def score(self):
+        return sum(correct is True for correct in self.answers.values())
+
+    @property
+    def max_score(self):
+        return self.answer_key.max_score * len(self.sittings)
+
+    def _sit(self, attempt_public_id):
+        self.sittings.add(attempt_public_id)
+        if attempt_public_id is not None:
+            self.attempts.setdefault(attempt_public_id, {'score': 0, 'max_score': self.answer_key.max_score})
+
+    def add(self, public_id, question_id, correct, attempt_public_id=None):
+        self.answers[public_id] = correct
+        if question_id in self.questions:
+            self.questions[question_id]['submitted'] += 1
+            self.questions[question_id]['correct'] += correct is True
+        self._sit(attempt_public_id)
+        if attempt_public_id is not None:
+            self.attempts[attempt_public_id]['score'] += correct is True
+
+    def question_results(self):
+        return [
+            {'question_public_id': self.answer_key.questions[question_id][0]} | counts
+            for question_id, counts in self.questions.items()
+        ]
+
+    def attempt_results(self):
+        return [{'attempt_public_id': public_id} | scores for public_id, scores in self.attempts.items()]
+
+    def answer_results(self):
+        return [{'public_id': public_id, 'correct': correct} for public_id, correct in self.answers.items()]
+
+    def summary(self):
+        return {
+            'score': self.score,
+            'max_score': self.max_score,
+            'questions': self.question_results(),
+        }
+
+
+def grade(answer_key, submissions, attempt_public_ids=()):
+    """
+    Grades (public_id, question pk, answer, possible answer pks, attempt public_id) rows
+    in a single pass against a prebuilt key. `attempt_public_ids` are attempts to score even if they have no answers.
+    """
+    result = GradingResult(answer_key, attempt_public_ids)
+    for public_id, question_id, answer, question_answer_ids, attempt_public_id in submissions:
+        result.add(public_id,
+                   question_id,
+                   answer_key.is_correct(question_id, answer, question_answer_ids),
+                   attempt_public_id)
+    return result
+
+
+def grade_queryset(answer_key, submitted_answers, attempt_public_ids=()):
+    """
+    Grades every submitted answer in a queryset with two flat queries, however many there are.
+    """
+    selected_answers = {}
+    for submitted_answer_id, question_answer_id in SubmittedAnswer.question_answers.through.objects.filter(
+            submittedanswer__in=submitted_answers).values_list('submittedanswer_id', 'questionanswer_id'):
+        selected_answers.setdefault(submitted_answer_id, []).append(question_answer_id)
+
+    return grade(answer_key, (
+        (public_id, question_id, answer, selected_answers.get(submitted_answer_id, ()), attempt_public_id)
+        for submitted_answer_id, public_id, question_id, answer, attempt_public_id in submitted_answers.values_list(
+            'id', 'public_id', 'question_id', 'answer', 'attempt__public_id')
+    ), attempt_public_ids)
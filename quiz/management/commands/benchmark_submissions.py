@@ -0,0 +1,122 @@
+import multiprocessing
+import statistics
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction, OperationalError
+
+# Spawned workers import this module before setting up Django, so models are only imported in functions.
+
+# SQLite's own defaults, which Django used before the tuned OPTIONS: full syncs, deferred transactions and
+# a 5 second busy timeout. The journal mode is stored in the database file, so it is switched once per run.
+DEFAULT_OPTIONS = {'init_command': 'PRAGMA synchronous=FULL'}
+
+
+def _setup_worker(options):
+    django.setup()
+    connections['default'].close()
+    connections['default'].settings_dict['OPTIONS'] = options
+
+
+def _submit(user_pk, quiz_pk, question_pk, question_answer_pks, writes):
+    """
+    Submits `writes` single-answer attempts and changes each answer once, the way the submission endpoints do.
+    Returns the latency of every successful transaction, the errors of the failed ones and when the worker
+    started and finished.
+    """
+    from quiz.counters import count_submissions
+    from quiz.models import QuizAttempt, SubmittedAnswer
+
+    timings, errors = [], Counter()
+
+    def timed(write):
+        started = time.perf_counter()
+        try:
+            with transaction.atomic():
+                result = write()
+        except OperationalError as error:
+            errors[str(error)] += 1
+            return None
+        timings.append((time.perf_counter() - started) * 1000)
+        return result
+
+    def create():
+        attempt = QuizAttempt.objects.create(user_id=user_pk, quiz_id=quiz_pk)
+        answer = SubmittedAnswer.objects.create(attempt=attempt, question_id=question_pk)
+        answer.question_answers.add(question_answer_pks[0])
+        count_submissions([(quiz_pk, question_pk, question_answer_pks[:1])])
+        return answer
+
+    def change(answer):
+        # Reads before writing, like the update endpoint. A deferred transaction then has to upgrade its read lock.
+        previous = list(answer.question_answers.values_list('pk', flat=True))
+        count_submissions([(quiz_pk, question_pk, previous)], delta=-1)
+        answer.question_answers.set(question_answer_pks[1:])
+        count_submissions([(quiz_pk, question_pk, question_answer_pks[1:])])
+
+    began = time.time()
+    for _ in range(writes):
+        answer = timed(create)
+        if answer is not None:
+            timed(lambda: change(answer))
+    connections.close_all()
+    return timings, errors, began, time.time()
+
+
+class Command(BaseCommand):
+    help = ('Submits answers from several processes at once and compares SQLite with its default journal and '
+            'transaction mode against the configured OPTIONS. Run it against a scratch database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--writes', type=int, default=250, help='Submissions per process.')
+
+    def handle(self, *args, **options):
+        from django.contrib.auth import get_user_model
+        from article.models import Article
+        from quiz.models import Quiz, Question, QuestionAnswer
+        from user.models import USER_ROLES
+
+        if connections['default'].vendor != 'sqlite':
+            raise CommandError('The default database is not SQLite.')
+
+        user, _ = get_user_model().objects.get_or_create(username='bench-writer', defaults={
+            'email': 'bench-writer@bench.invalid', 'password': '!', 'role': USER_ROLES['Student']})
+        article = Article.objects.create(author=user, title='Benchmark', description='Benchmark')
+        quiz = Quiz.objects.create(author=user, article=article, title='Benchmark', description='Benchmark')
+        question = Question.objects.create(quiz=quiz, title='Benchmark', description='Benchmark', question_type='S')
+        question_answers = [QuestionAnswer.objects.create(question=question, value=value) for value in 'AB']
+        fixture = (user.pk, quiz.pk, question.pk, [question_answer.pk for question_answer in question_answers])
+
+        try:
+            for mode, journal_mode, sqlite_options in [
+                ('default', 'DELETE', DEFAULT_OPTIONS),
+                ('tuned', 'WAL', settings.DATABASES['default'].get('OPTIONS', {})),
+            ]:
+                with connections['default'].cursor() as cursor:
+                    cursor.execute(f'PRAGMA journal_mode={journal_mode}')
+                self.run(mode, sqlite_options, fixture, options)
+        finally:
+            article.delete()
+
+    def run(self, mode, sqlite_options, fixture, options):
+        with ProcessPoolExecutor(max_workers=options['processes'], mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_setup_worker, initargs=(sqlite_options,)) as executor:
+            results = list(executor.map(_submit, *zip(*[(*fixture, options['writes'])] * options['processes'])))
+
+        # Workers time themselves, so spawning them and setting up Django is not counted.
+        elapsed = max(result[3] for result in results) - min(result[2] for result in results)
+        timings = sorted(timing for result in results for timing in result[0])
+        errors = sum((result[1] for result in results), Counter())
+        if timings:
+            self.stdout.write(f'{mode:>8}: {len(timings) / elapsed:.0f} transactions/s, median '
+                              f'{statistics.median(timings):.2f} ms, p95 {timings[len(timings) * 95 // 100]:.2f} ms, '
+                              f'{sum(errors.values())} failed')
+        else:
+            self.stdout.write(f'{mode:>8}: every submission failed')
+        for error, count in errors.most_common():
+            self.stdout.write(f'{"":>10}{count} x {error}')
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz.exports import EXPORT_FORMATS, export_lines
+from quiz.models import Quiz
+
+
+class Command(BaseCommand):
+    help = 'Streams every answer submitted to a quiz as CSV or NDJSON to a file or standard output.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('quiz_public_id')
+        parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--output', help='File to write to, standard output if omitted.')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        quiz = Quiz.objects.filter(public_id=options['quiz_public_id']).first()
+        if quiz is None:
+            raise CommandError(f'Quiz {options["quiz_public_id"]} does not exist.')
+
+        lines = export_lines(quiz, options['format'], options['chunk_size'])
+        if options['output'] is None:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+
+        with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+            output.writelines(lines)
+        self.stderr.write(self.style.SUCCESS(f'Exported quiz {quiz.public_id} to {options["output"]}.'))
@@ -0,0 +1,28 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from quiz import submission_queue
+
+
+class Command(BaseCommand):
+    help = ('Writes answers waiting in the submission queue to the database. With --loop it keeps flushing every '
+            'SUBMISSION_QUEUE_FLUSH_INTERVAL seconds, for deployments where web processes do not flush themselves.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep flushing until interrupted.')
+
+    def handle(self, *args, **options):
+        if not submission_queue.is_enabled():
+            raise CommandError('SUBMISSION_QUEUE_PATH is not set.')
+
+        while True:
+            close_old_connections()
+            written = submission_queue.flush()
+            if written or not options['loop']:
+                self.stdout.write(f'Flushed {written} submissions, {submission_queue.pending()} still queued.')
+            if not options['loop']:
+                return
+            time.sleep(settings.SUBMISSION_QUEUE_FLUSH_INTERVAL or 1)
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from quiz.models import Quiz, Question, QuestionAnswer, SubmittedAnswer, QuizSubmissionCounter, \
+    QuestionSubmissionCounter, QuestionAnswerSubmissionCounter
+
+
+class Command(BaseCommand):
+    help = ('Recounts quiz, question and possible answer submission counters from the submitted answers, '
+            'reports every counter that drifted and fixes it.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report drift, do not fix it.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        submissions = SubmittedAnswer.objects.order_by()
+        counters = [
+            (QuizSubmissionCounter, Quiz, submissions.values('question__quiz_id').annotate(
+                count=Count('id')).values_list('question__quiz_id', 'count')),
+            (QuestionSubmissionCounter, Question, submissions.values('question_id').annotate(
+                count=Count('id')).values_list('question_id', 'count')),
+            (QuestionAnswerSubmissionCounter, QuestionAnswer, SubmittedAnswer.question_answers.through.objects.order_by()
+             .values('questionanswer_id').annotate(count=Count('id')).values_list('questionanswer_id', 'count')),
+        ]
+
+        drifted = 0
+        with transaction.atomic():
+            for counter_model, model, actual_counts in counters:
+                actual_counts = dict(actual_counts)
+                stored_counts = dict(counter_model.objects.values_list('pk', 'submissions'))
+
+                missing, changed = [], []
+                for pk in model.objects.order_by('pk').values_list('pk', flat=True).iterator():
+                    actual, stored = actual_counts.get(pk, 0), stored_counts.get(pk)
+                    if stored == actual:
+                        continue
+
+                    self.stdout.write(f'{model.__name__} {pk}: stored {"missing" if stored is None else stored}, '
+                                      f'actual {actual}')
+                    counter = counter_model(pk=pk, submissions=actual)
+                    (missing if stored is None else changed).append(counter)
+
+                drifted += len(missing) + len(changed)
+                if not options['dry_run']:
+                    counter_model.objects.bulk_create(missing, batch_size=options['batch_size'])
+                    counter_model.objects.bulk_update(changed, ['submissions'], batch_size=options['batch_size'])
+
+        if drifted == 0:
+            self.stdout.write(self.style.SUCCESS('All submission counters are accurate.'))
+        elif options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'{drifted} submission counters drifted.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Fixed {drifted} drifted submission counters.'))
@@ -0,0 +1,16 @@
+from django.db import models
+
+
+class QuizQuerySet(models.QuerySet):
+    def with_full_tree(self):
+        """
+        Loads everything QuizFullSerializer renders in a fixed number of queries:
+        the quiz with its author and article, then one query each for questions,
+        their possible answers and their correct answers.
+        Reverse foreign key prefetches point each answer back at the already loaded
+        question and each question at the quiz, so nested serializers never hit the database.
+        """
+        return self.select_related('author', 'article').prefetch_related(
+            'questions__possible_answers',
+            'questions__question_answers',
+        )
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0008_quizattempt_submittedanswer_attempt'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionAnswerSubmissionCounter',
+            fields=[
+                ('submissions', models.BigIntegerField(default=0)),
+                ('question_answer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='submission_counter', serialize=False, to='quiz.questionanswer')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='QuestionSubmissionCounter',
+            fields=[
+                ('submissions', models.BigIntegerField(default=0)),
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='submission_counter', serialize=False, to='quiz.question')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='QuizSubmissionCounter',
+            fields=[
+                ('submissions', models.BigIntegerField(default=0)),
+                ('quiz', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='submission_counter', serialize=False, to='quiz.quiz')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
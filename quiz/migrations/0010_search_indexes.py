@@ -0,0 +1,48 @@
+from django.db import migrations
+
+# The DDL is frozen here, so later changes to quiz.search do not change what this migration does.
+CREATE = {
+    'sqlite': [
+        'CREATE VIRTUAL TABLE "quiz_quiz_fts" USING fts5(title, description, '
+        'tokenize="unicode61 remove_diacritics 2")',
+        'INSERT INTO "quiz_quiz_fts" (rowid, title, description) SELECT id, title, description FROM "quiz_quiz"',
+        'CREATE VIRTUAL TABLE "quiz_question_fts" USING fts5(title, description, '
+        'tokenize="unicode61 remove_diacritics 2")',
+        'INSERT INTO "quiz_question_fts" (rowid, title, description) '
+        'SELECT id, title, description FROM "quiz_question"',
+    ],
+    'postgresql': [
+        'CREATE INDEX "quiz_quiz_fts_idx" ON "quiz_quiz" USING GIN (('
+        "setweight(to_tsvector('simple', coalesce(\"title\", '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(\"description\", '')), 'B')))",
+        'CREATE INDEX "quiz_question_fts_idx" ON "quiz_question" USING GIN (('
+        "setweight(to_tsvector('simple', coalesce(\"title\", '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(\"description\", '')), 'B')))",
+    ],
+}
+
+DROP = {
+    'sqlite': ['DROP TABLE IF EXISTS "quiz_quiz_fts"', 'DROP TABLE IF EXISTS "quiz_question_fts"'],
+    'postgresql': ['DROP INDEX IF EXISTS "quiz_quiz_fts_idx"', 'DROP INDEX IF EXISTS "quiz_question_fts_idx"'],
+}
+
+
+def create_search_indexes(apps, schema_editor):
+    for statement in CREATE.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def drop_search_indexes(apps, schema_editor):
+    for statement in DROP.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0009_submission_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 14:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0010_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.1 on 2026-10-18 14:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0011_question_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
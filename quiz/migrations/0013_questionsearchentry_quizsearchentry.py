@@ -0,0 +1,34 @@
+# Generated by Django 5.1.1 on 2026-10-18 15:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0012_quiz_question_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionSearchEntry',
+            fields=[
+                ('question', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='quiz.question')),
+            ],
+            options={
+                'db_table': 'quiz_question_fts',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='QuizSearchEntry',
+            fields=[
+                ('quiz', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='quiz.quiz')),
+            ],
+            options={
+                'db_table': 'quiz_quiz_fts',
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+from django.db import migrations
+
+# The rowid encodes the type as id * 3 + position in ['article', 'quiz', 'question'], see quiz.search.
+CREATE = {
+    'sqlite': [
+        'CREATE VIRTUAL TABLE "search_document_fts" USING fts5(title, description, '
+        'tokenize="unicode61 remove_diacritics 2")',
+        'INSERT INTO "search_document_fts" (rowid, title, description) '
+        'SELECT id * 3, title, description FROM "article_article"',
+        'INSERT INTO "search_document_fts" (rowid, title, description) '
+        'SELECT id * 3 + 1, title, description FROM "quiz_quiz"',
+        'INSERT INTO "search_document_fts" (rowid, title, description) '
+        'SELECT id * 3 + 2, title, description FROM "quiz_question"',
+    ],
+}
+
+DROP = {
+    'sqlite': ['DROP TABLE IF EXISTS "search_document_fts"'],
+}
+
+
+def create_search_index(apps, schema_editor):
+    for statement in CREATE.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    for statement in DROP.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('article', '0011_articlesearchentry'),
+        ('quiz', '0013_questionsearchentry_quizsearchentry'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
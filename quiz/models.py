@@ -3,6 +3,7 @@ import uuid
 from django.db import models
 
 from CorralSnake.utils import uuid_upload_to
+from quiz.managers import QuizQuerySet
 
 
 QUESTION_TYPES = {
@@ -18,6 +19,9 @@ class Quiz(models.Model):
     article = models.ForeignKey('article.Article', on_delete=models.CASCADE, related_name='quizzes')
     title = models.CharField(max_length=255)
     description = models.TextField(max_length=10000)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = QuizQuerySet.as_manager()
 
 
 class Question(models.Model):
@@ -26,10 +30,36 @@ class Question(models.Model):
     title = models.CharField(max_length=255)
     description = models.TextField(max_length=10000)
     image = models.ImageField(upload_to=uuid_upload_to('questions/images'), null=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     question_type = models.CharField(blank=False, null=False, choices=QUESTION_TYPES, max_length=255)
     answer = models.CharField(max_length=255, blank=True, null=True)
     question_answers = models.ManyToManyField('QuestionAnswer', related_name='answers')
     order = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class QuizSearchEntry(models.Model):
+    """
+    A row of the SQLite FTS5 table of quiz_index, so searches can join it. The table is not managed by Django.
+    """
+    quiz = models.OneToOneField(Quiz, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid',
+                                related_name='search_entry')
+
+    class Meta:
+        managed = False
+        db_table = 'quiz_quiz_fts'
+
+
+class QuestionSearchEntry(models.Model):
+    """
+    A row of the SQLite FTS5 table of question_index, so searches can join it. The table is not managed by Django.
+    """
+    question = models.OneToOneField(Question, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid',
+                                    related_name='search_entry')
+
+    class Meta:
+        managed = False
+        db_table = 'quiz_question_fts'
 
 
 class QuestionAnswer(models.Model):
@@ -39,9 +69,50 @@ class QuestionAnswer(models.Model):
     order = models.IntegerField(default=0)
 
 
+class QuizAttempt(models.Model):
+    public_id = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    user = models.ForeignKey('user.User', on_delete=models.CASCADE, related_name='quiz_attempts')
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='attempts')
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'quiz', '-started_at'], name='quiz_attempt_user_quiz_idx'),
+            models.Index(fields=['quiz', '-started_at'], name='quiz_attempt_quiz_idx'),
+        ]
+
+
 class SubmittedAnswer(models.Model):
     public_id = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    # Nullable only for answers submitted before attempts existed, the API always sets it.
+    attempt = models.ForeignKey(QuizAttempt, on_delete=models.CASCADE, related_name='answers', null=True)
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
     answer = models.CharField(max_length=255, null=True)
     question_answers = models.ManyToManyField(QuestionAnswer, related_name='submitted_answers')
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['attempt', 'question'], name='submitted_answer_attempt_question_unique'),
+        ]
+
+
+class SubmissionCounter(models.Model):
+    submissions = models.BigIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class QuizSubmissionCounter(SubmissionCounter):
+    quiz = models.OneToOneField(Quiz, on_delete=models.CASCADE, primary_key=True, related_name='submission_counter')
+
+
+class QuestionSubmissionCounter(SubmissionCounter):
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, primary_key=True,
+                                    related_name='submission_counter')
+
+
+class QuestionAnswerSubmissionCounter(SubmissionCounter):
+    question_answer = models.OneToOneField(QuestionAnswer, on_delete=models.CASCADE, primary_key=True,
+                                           related_name='submission_counter')
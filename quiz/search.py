@@ -0,0 +1,6 @@
+from CorralSnake.search import CombinedIndex, FullTextIndex
+
+quiz_index = FullTextIndex('quiz_quiz', {'title': 'A', 'description': 'B'})
+question_index = FullTextIndex('quiz_question', {'title': 'A', 'description': 'B'})
+# Articles, quizzes and questions for the unified /search/ endpoint. The type order is part of the SQLite rowids.
+combined_index = CombinedIndex('search_document_fts', {'title': 'A', 'description': 'B'}, ['article', 'quiz', 'question'])
@@ -1,9 +1,18 @@
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from django.utils.translation import gettext as _
 from rest_framework import serializers
 
+from CorralSnake.fields import ImageVariantsField
+from CorralSnake.images import IMAGE_WIDTHS
+from CorralSnake.serializers import ImageVariantsMixin
 from article.models import Article
 from article.serializers import ArticleSerializer
-from quiz.models import Quiz, SubmittedAnswer, QuestionAnswer, Question
+from quiz.counters import count_submissions
+from quiz.models import Quiz, SubmittedAnswer, QuestionAnswer, Question, QuizAttempt, QuestionSubmissionCounter, \
+    QuestionAnswerSubmissionCounter
+from quiz.search import question_index, combined_index
 from user.serializers import FriendSerializer
 
 User = get_user_model()
@@ -35,6 +44,8 @@ class QuizSerializer(serializers.ModelSerializer):
 
 
 class QuestionBasicSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = Question
         fields = [
@@ -42,6 +53,7 @@ class QuestionBasicSerializer(serializers.ModelSerializer):
             'title',
             'description',
             'image',
+            'image_variants',
             'question_type',
             'answer'
         ]
@@ -59,7 +71,7 @@ class QuestionAnswerBasicSerializer(serializers.ModelSerializer):
         read_only_fields = ['public_id']
 
 
-class QuestionSerializer(QuestionBasicSerializer):
+class QuestionSerializer(ImageVariantsMixin, QuestionBasicSerializer):
     quiz = ArticleSerializer(many=False, read_only=True)
     quiz_public_id = serializers.SlugRelatedField(
         source='quiz', queryset=Quiz.objects.all(), slug_field='public_id', write_only=True
@@ -70,6 +82,8 @@ class QuestionSerializer(QuestionBasicSerializer):
         many=True, source='question_answers', queryset=QuestionAnswer.objects.all(), slug_field='public_id', write_only=True
     )
 
+    variant_specs = {'image': ('width', IMAGE_WIDTHS)}
+
     class Meta:
         model = Question
         fields = [
@@ -79,6 +93,7 @@ class QuestionSerializer(QuestionBasicSerializer):
             'title',
             'description',
             'image',
+            'image_variants',
             'question_type',
             'answer',
             'question_answers',
@@ -115,7 +130,34 @@ class SubmitterAnswerBasicSerializer(serializers.ModelSerializer):
         read_only_fields = ['public_id']
 
 
+def validate_attempt(attempt, user, quiz_id):
+    """
+    Checks that answers can be added to an attempt: it belongs to the user, is still open and is for the same quiz.
+    """
+    if attempt.user_id != user.pk:
+        raise serializers.ValidationError({'attempt_public_id': [_('Attempt belongs to another user. ')]})
+    if attempt.finished_at is not None:
+        raise serializers.ValidationError({'attempt_public_id': [_('Attempt is already finished. ')]})
+    if attempt.quiz_id != quiz_id:
+        raise serializers.ValidationError({'attempt_public_id': [_('Attempt is for another quiz. ')]})
+
+
+def selection_error(question, question_answers):
+    """
+    Returns why a selection of possible answers cannot be submitted to a question, or None.
+    """
+    if len(set(question_answers)) != len(question_answers):
+        return _('Answer was selected more than once. ')
+    if question.question_type == 'S' and len(question_answers) > 1:
+        return _('A single choice question can have only one selected answer. ')
+    return None
+
+
 class SubmittedAnswerSerializer(SubmitterAnswerBasicSerializer):
+    attempt_public_id = serializers.SlugRelatedField(
+        source='attempt', queryset=QuizAttempt.objects.all(), slug_field='public_id', write_only=True
+    )
+
     question = QuestionSerializer(many=False, read_only=True)
     question_public_id = serializers.SlugRelatedField(
         source='question', queryset=Question.objects.all(), slug_field='public_id', write_only=True
@@ -131,6 +173,7 @@ class SubmittedAnswerSerializer(SubmitterAnswerBasicSerializer):
         model = SubmittedAnswer
         fields = [
             'public_id',
+            'attempt_public_id',
             'question',
             'question_public_id',
             'answer',
@@ -138,6 +181,164 @@ class SubmittedAnswerSerializer(SubmitterAnswerBasicSerializer):
         ]
         read_only_fields = ['public_id']
 
+    def validate(self, attrs):
+        question = attrs.get('question', getattr(self.instance, 'question', None))
+        if 'attempt' in attrs:
+            validate_attempt(attrs['attempt'], self.context['request'].user, question.quiz_id)
+        if 'question_answers' in attrs:
+            error = selection_error(question, attrs['question_answers'])
+            if error is not None:
+                raise serializers.ValidationError({'question_answers': [error]})
+        return attrs
+
+
+class SubmittedAnswerBatchItemSerializer(serializers.Serializer):
+    public_id = serializers.UUIDField(read_only=True)
+    question_public_id = serializers.UUIDField()
+    answer = serializers.CharField(max_length=255, required=False, allow_null=True, allow_blank=True)
+    question_answers = serializers.ListField(child=serializers.UUIDField(), required=False)
+
+
+class SubmittedAnswerBatchSerializer(serializers.Serializer):
+    """
+    Takes every answer of a quiz attempt at once and finishes the attempt.
+    Without an attempt_public_id a new attempt is started and finished by the same request.
+    All referenced questions and possible answers are resolved with one lookup each, and the submitted answers
+    with their possible answer links are written with two bulk inserts in one transaction.
+    """
+    quiz_public_id = serializers.UUIDField()
+    attempt_public_id = serializers.UUIDField(required=False)
+    answers = SubmittedAnswerBatchItemSerializer(many=True, allow_empty=False)
+
+    def validate(self, attrs):
+        answers = attrs['answers']
+
+        questions = {
+            question.public_id: question
+            for question in Question.objects.filter(
+                quiz__public_id=attrs['quiz_public_id'],
+                public_id__in={answer['question_public_id'] for answer in answers}
+            ).only('id', 'public_id', 'quiz_id', 'question_type')
+        }
+        question_answers = {
+            question_answer.public_id: question_answer
+            for question_answer in QuestionAnswer.objects.filter(
+                question__in=questions.values(),
+                public_id__in={public_id for answer in answers for public_id in answer.get('question_answers', [])}
+            ).only('id', 'public_id', 'question_id')
+        }
+
+        answered_questions = set()
+        if 'attempt_public_id' in attrs:
+            attempt = QuizAttempt.objects.filter(public_id=attrs['attempt_public_id']).first()
+            if attempt is None:
+                raise serializers.ValidationError({'attempt_public_id': [_('Attempt does not exist. ')]})
+            if questions:
+                validate_attempt(attempt, self.context['request'].user, next(iter(questions.values())).quiz_id)
+            attrs['attempt'] = attempt
+            answered_questions = set(attempt.answers.values_list('question_id', flat=True))
+
+        errors = []
+        for answer in answers:
+            error = {}
+            question = questions.get(answer['question_public_id'])
+            if question is None:
+                error['question_public_id'] = [_('Question does not belong to this quiz. ')]
+            elif question.pk in answered_questions:
+                error['question_public_id'] = [_('Question was answered more than once. ')]
+            else:
+                answered_questions.add(question.pk)
+                answer['question'] = question
+
+                selection = answer.get('question_answers', [])
+                if any(question_answers.get(public_id) is None or question_answers[public_id].question_id != question.pk
+                       for public_id in selection):
+                    selection_problem = _('Answer does not belong to this question. ')
+                else:
+                    selection_problem = selection_error(question, selection)
+
+                if selection_problem is not None:
+                    error['question_answers'] = [selection_problem]
+                else:
+                    answer['question_answer_objects'] = [question_answers[public_id] for public_id in selection]
+            errors.append(error)
+
+        if any(errors):
+            raise serializers.ValidationError({'answers': errors})
+        return attrs
+
+    @transaction.atomic
+    def create(self, validated_data):
+        attempt = validated_data.pop('attempt', None)
+        if attempt is None:
+            attempt = QuizAttempt.objects.create(user=self.context['request'].user,
+                                                 quiz_id=validated_data['answers'][0]['question'].quiz_id,
+                                                 finished_at=timezone.now())
+        else:
+            attempt.finished_at = timezone.now()
+            attempt.save(update_fields=['finished_at'])
+        validated_data['attempt_public_id'] = attempt.public_id
+
+        submitted_answers = SubmittedAnswer.objects.bulk_create([
+            SubmittedAnswer(attempt=attempt, question=answer['question'], answer=answer.get('answer'))
+            for answer in validated_data['answers']
+        ])
+
+        SubmittedAnswerThrough = SubmittedAnswer.question_answers.through
+        SubmittedAnswerThrough.objects.bulk_create([
+            SubmittedAnswerThrough(submittedanswer_id=submitted_answer.pk, questionanswer_id=question_answer.pk)
+            for submitted_answer, answer in zip(submitted_answers, validated_data['answers'])
+            for question_answer in answer['question_answer_objects']
+        ])
+
+        count_submissions([
+            (attempt.quiz_id, answer['question'].pk, [question_answer.pk for question_answer in answer['question_answer_objects']])
+            for answer in validated_data['answers']
+        ])
+
+        for submitted_answer, answer in zip(submitted_answers, validated_data['answers']):
+            answer['public_id'] = submitted_answer.public_id
+        return validated_data
+
+
+class QuizAttemptAnswerSerializer(serializers.ModelSerializer):
+    question_public_id = serializers.SlugRelatedField(source='question', slug_field='public_id', read_only=True)
+    question_answers = serializers.SlugRelatedField(many=True, slug_field='public_id', read_only=True)
+
+    class Meta:
+        model = SubmittedAnswer
+        fields = [
+            'public_id',
+            'question_public_id',
+            'answer',
+            'question_answers',
+        ]
+        read_only_fields = ['public_id']
+
+
+class QuizAttemptSerializer(serializers.ModelSerializer):
+    user = FriendSerializer(many=False, read_only=True)
+    quiz_public_id = serializers.SlugRelatedField(
+        source='quiz', queryset=Quiz.objects.all(), slug_field='public_id'
+    )
+    answers = QuizAttemptAnswerSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = QuizAttempt
+        fields = [
+            'public_id',
+            'user',
+            'quiz_public_id',
+            'started_at',
+            'finished_at',
+            'answers'
+        ]
+        read_only_fields = ['public_id', 'started_at', 'finished_at']
+
+
+class GradeSubmissionsSerializer(serializers.Serializer):
+    submissions = serializers.ListField(child=serializers.UUIDField(), allow_empty=False)
+
 
 class QuestionWithPossibleAnswersSerializer(QuestionBasicSerializer):
     possible_answers = QuestionAnswerSerializer(many=True, read_only=True)
@@ -174,3 +375,100 @@ class QuizFullSerializer(serializers.ModelSerializer):
             'questions'
         ]
         read_only_fields = ['public_id']
+
+
+class QuestionAnswerBulkSerializer(serializers.ModelSerializer):
+    correct = serializers.BooleanField(default=False, write_only=True)
+
+    class Meta:
+        model = QuestionAnswer
+        fields = [
+            'value',
+            'order',
+            'correct'
+        ]
+
+
+class QuestionBulkSerializer(serializers.ModelSerializer):
+    possible_answers = QuestionAnswerBulkSerializer(many=True, required=False)
+
+    class Meta:
+        model = Question
+        fields = [
+            'title',
+            'description',
+            'question_type',
+            'answer',
+            'order',
+            'possible_answers'
+        ]
+
+    def validate(self, attrs):
+        correct_count = sum(answer['correct'] for answer in attrs.get('possible_answers', []))
+        if attrs['question_type'] == 'S' and correct_count > 1:
+            raise serializers.ValidationError(_('A single choice question can have only one correct answer. '))
+        return attrs
+
+
+class QuizBulkSerializer(serializers.ModelSerializer):
+    """
+    Validates a whole quiz with its questions and possible answers up front
+    and writes it with one bulk insert per table inside a single transaction.
+    """
+    author_pk = serializers.SlugRelatedField(
+        source='author', queryset=User.objects.all(), slug_field='pk', write_only=True
+    )
+    article_public_id = serializers.SlugRelatedField(
+        source='article', queryset=Article.objects.all(), slug_field='public_id', write_only=True
+    )
+    questions = QuestionBulkSerializer(many=True, allow_empty=False)
+
+    class Meta:
+        model = Quiz
+        fields = [
+            'public_id',
+            'author_pk',
+            'title',
+            'description',
+            'article_public_id',
+            'questions'
+        ]
+        read_only_fields = ['public_id']
+
+    @transaction.atomic
+    def create(self, validated_data):
+        questions_data = validated_data.pop('questions')
+        quiz = Quiz.objects.create(**validated_data)
+
+        questions = Question.objects.bulk_create([
+            Question(quiz=quiz, **{key: value for key, value in question_data.items() if key != 'possible_answers'})
+            for question_data in questions_data
+        ])
+        question_index.add(questions)
+        combined_index.add(questions)
+
+        answers = []
+        correct_answers = []
+        for question, question_data in zip(questions, questions_data):
+            for answer_data in question_data.get('possible_answers', []):
+                answer = QuestionAnswer(question=question,
+                                        value=answer_data.get('value'),
+                                        order=answer_data.get('order', 0))
+                answers.append(answer)
+                if answer_data['correct']:
+                    correct_answers.append((question, answer))
+        QuestionAnswer.objects.bulk_create(answers)
+
+        # bulk_create skips post_save, so the counters the signal handler would create are inserted here.
+        QuestionSubmissionCounter.objects.bulk_create([QuestionSubmissionCounter(question=question)
+                                                       for question in questions])
+        QuestionAnswerSubmissionCounter.objects.bulk_create([QuestionAnswerSubmissionCounter(question_answer=answer)
+                                                             for answer in answers])
+
+        QuestionAnswerThrough = Question.question_answers.through
+        QuestionAnswerThrough.objects.bulk_create([
+            QuestionAnswerThrough(question_id=question.pk, questionanswer_id=answer.pk)
+            for question, answer in correct_answers
+        ])
+
+        return quiz
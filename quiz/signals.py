@@ -0,0 +1,100 @@
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+from article.models import Article
+
+from quiz.cache import bump_quiz_version
+from quiz.counters import count_submissions
+from quiz.models import Quiz, Question, QuestionAnswer, QuizSubmissionCounter, QuestionSubmissionCounter, \
+    QuestionAnswerSubmissionCounter, SubmittedAnswer
+from user.models import User
+
+# User fields the quiz payload renders for its author.
+AUTHOR_FIELDS = {'public_id', 'username', 'first_name', 'last_name', 'pfp', 'pfp_variants', 'role'}
+
+
+def _touch(queryset):
+    """
+    Moves updated_at of rows that render the changed object nested, so their ETags change too.
+    """
+    queryset.update(updated_at=timezone.now())
+
+
+def _bump_quizzes_of_questions(question_pks):
+    for public_id in Quiz.objects.filter(questions__pk__in=question_pks).values_list('public_id', flat=True).distinct():
+        bump_quiz_version(public_id)
+    _touch(Question.objects.filter(pk__in=question_pks))
+    _touch(Quiz.objects.filter(questions__pk__in=question_pks))
+
+
+@receiver([post_save, post_delete], sender=Quiz)
+def quiz_changed(sender, instance, **kwargs):
+    bump_quiz_version(instance.public_id)
+    _touch(Article.objects.filter(pk=instance.article_id))
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Quiz payloads render their author, so changing one moves every quiz they wrote to a new version.
+    Saves of fields the payload does not show, like last_login, are skipped.
+    """
+    if created or (update_fields is not None and not AUTHOR_FIELDS.intersection(update_fields)):
+        return
+    for public_id in Quiz.objects.filter(author=instance).values_list('public_id', flat=True):
+        bump_quiz_version(public_id)
+
+
+@receiver(post_save, sender=Quiz)
+@receiver(post_save, sender=Question)
+@receiver(post_save, sender=QuestionAnswer)
+def create_submission_counter(sender, instance, created, **kwargs):
+    """
+    Counter rows exist from the start, so counting a submission is a plain UPDATE.
+    """
+    if created:
+        counter_model = {
+            Quiz: QuizSubmissionCounter,
+            Question: QuestionSubmissionCounter,
+            QuestionAnswer: QuestionAnswerSubmissionCounter,
+        }[sender]
+        counter_model.objects.bulk_create([counter_model(pk=instance.pk)], ignore_conflicts=True)
+
+
+@receiver(pre_delete, sender=SubmittedAnswer)
+def uncount_submission(sender, instance, **kwargs):
+    """
+    Takes a deleted submission off the counters, also when it goes with its question, quiz or attempt.
+    Runs before the delete, while the links to its possible answers still exist.
+    """
+    count_submissions([(instance.question.quiz_id, instance.question_id,
+                        list(instance.question_answers.values_list('pk', flat=True)))], delta=-1)
+
+
+@receiver([post_save, post_delete], sender=Question)
+def question_changed(sender, instance, **kwargs):
+    try:
+        bump_quiz_version(instance.quiz.public_id)
+    except Quiz.DoesNotExist:
+        pass
+    _touch(Quiz.objects.filter(pk=instance.quiz_id))
+
+
+@receiver([post_save, post_delete], sender=QuestionAnswer)
+def question_answer_changed(sender, instance, **kwargs):
+    _bump_quizzes_of_questions([instance.question_id])
+
+
+@receiver(m2m_changed, sender=Question.question_answers.through)
+def question_answers_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        # A cleared reverse set no longer knows its questions afterwards, so catch it before.
+        if action in ('post_add', 'post_remove'):
+            _bump_quizzes_of_questions(pk_set)
+        elif action == 'pre_clear':
+            _bump_quizzes_of_questions(instance.answers.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        bump_quiz_version(instance.quiz.public_id)
+        _touch(Question.objects.filter(pk=instance.pk))
+        _touch(Quiz.objects.filter(pk=instance.quiz_id))
@@ -0,0 +1,238 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.db import transaction, close_old_connections
+
+from quiz.counters import count_submissions
+from quiz.models import SubmittedAnswer, QuizAttempt, Question, QuestionAnswer
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+_flusher = {'pid': None, 'thread': None}
+_flusher_lock = threading.Lock()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS submission (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    public_id TEXT NOT NULL UNIQUE,
+    user_id INTEGER NOT NULL,
+    attempt_id INTEGER NOT NULL,
+    question_id INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    queued_at REAL NOT NULL,
+    claimed_at REAL,
+    UNIQUE (attempt_id, question_id)
+)
+"""
+
+
+def is_enabled():
+    return bool(settings.SUBMISSION_QUEUE_PATH)
+
+
+def _connection():
+    """
+    Returns this thread's connection to the queue file, a SQLite database on local disk next to the web processes.
+    Every enqueue is synced before it is acknowledged, so accepted submissions survive a crash.
+    """
+    connection = getattr(_local, 'connection', None)
+    if connection is None or _local.pid != os.getpid() or _local.path != settings.SUBMISSION_QUEUE_PATH:
+        connection = sqlite3.connect(settings.SUBMISSION_QUEUE_PATH, timeout=20, isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=FULL')
+        connection.execute(SCHEMA)
+        _local.connection, _local.pid, _local.path = connection, os.getpid(), settings.SUBMISSION_QUEUE_PATH
+    return connection
+
+
+def _entry(row):
+    public_id, user_id, attempt_id, question_id, payload, queued_at = row
+    return {
+        'public_id': uuid.UUID(public_id),
+        'user_id': user_id,
+        'attempt_id': attempt_id,
+        'question_id': question_id,
+        'queued_at': queued_at,
+        **json.loads(payload),
+    }
+
+
+def enqueue(user, attempt, question, answer, question_answers):
+    """
+    Stores a validated submission in the queue and returns it with its public_id, or None when the attempt
+    already has a queued answer to the question. The submission reaches the database with the next flush.
+    """
+    public_id = uuid.uuid4()
+    payload = {
+        'answer': answer,
+        'question_answer_ids': [question_answer.pk for question_answer in question_answers],
+        'question_answer_public_ids': [str(question_answer.public_id) for question_answer in question_answers],
+    }
+    try:
+        _connection().execute(
+            'INSERT INTO submission (public_id, user_id, attempt_id, question_id, payload, queued_at) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (str(public_id), user.pk, attempt.pk, question.pk, json.dumps(payload), time.time()))
+    except sqlite3.IntegrityError:
+        return None
+    start_flusher()
+    return get(public_id)
+
+
+def get(public_id):
+    """
+    Returns a submission that is still waiting in the queue, or None.
+    """
+    row = _connection().execute(
+        'SELECT public_id, user_id, attempt_id, question_id, payload, queued_at FROM submission WHERE public_id = ?',
+        (str(public_id),)).fetchone()
+    return _entry(row) if row is not None else None
+
+
+def pending():
+    return _connection().execute('SELECT COUNT(*) FROM submission').fetchone()[0]
+
+
+def _claim(limit, attempt_id=None):
+    """
+    Claims the oldest unclaimed submissions for this flusher, only those of the given attempt if there is one.
+    Claims of a flusher that died are taken over once they are SUBMISSION_QUEUE_CLAIM_TIMEOUT seconds old.
+    """
+    connection = _connection()
+    now = time.time()
+    condition, params = ('AND attempt_id = ?', (attempt_id,)) if attempt_id is not None else ('', ())
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        rows = connection.execute(
+            'SELECT id, public_id, user_id, attempt_id, question_id, payload, queued_at FROM submission '
+            f'WHERE (claimed_at IS NULL OR claimed_at < ?) {condition} ORDER BY id LIMIT ?',
+            (now - settings.SUBMISSION_QUEUE_CLAIM_TIMEOUT, *params, limit)).fetchall()
+        connection.executemany('UPDATE submission SET claimed_at = ? WHERE id = ?', [(now, row[0]) for row in rows])
+        connection.execute('COMMIT')
+    except BaseException:
+        connection.execute('ROLLBACK')
+        raise
+    return [row[0] for row in rows], [_entry(row[1:]) for row in rows]
+
+
+def _write(entries):
+    """
+    Inserts claimed submissions with their possible answer links and counters in one transaction.
+    Submissions a previous flush already wrote are skipped, so a flush that died before it could remove them
+    from the queue is repeated safely. Submissions whose attempt was deleted or finished, whose question was
+    deleted, or whose question got answered in the meantime, are dropped.
+    """
+    with transaction.atomic():
+        written = set(SubmittedAnswer.objects.filter(
+            public_id__in=[entry['public_id'] for entry in entries]).values_list('public_id', flat=True))
+        attempts = set(QuizAttempt.objects.filter(
+            pk__in={entry['attempt_id'] for entry in entries}, finished_at__isnull=True).values_list('pk', flat=True))
+        questions = dict(Question.objects.filter(
+            pk__in={entry['question_id'] for entry in entries}).values_list('pk', 'quiz_id'))
+        question_answers = set(QuestionAnswer.objects.filter(
+            pk__in={pk for entry in entries for pk in entry['question_answer_ids']}).values_list('pk', flat=True))
+        answered = set(SubmittedAnswer.objects.filter(
+            attempt_id__in=attempts, question_id__in=questions).values_list('attempt_id', 'question_id'))
+
+        accepted = []
+        for entry in entries:
+            if entry['public_id'] in written:
+                continue
+            key = (entry['attempt_id'], entry['question_id'])
+            if entry['attempt_id'] not in attempts or entry['question_id'] not in questions or key in answered:
+                logger.warning('Dropping queued submission %s, its attempt is gone or finished, or its question is gone '
+                               'or already answered.',
+                               entry['public_id'])
+                continue
+            answered.add(key)
+            entry['question_answer_ids'] = [pk for pk in entry['question_answer_ids'] if pk in question_answers]
+            accepted.append(entry)
+
+        submitted_answers = SubmittedAnswer.objects.bulk_create([
+            SubmittedAnswer(public_id=entry['public_id'], attempt_id=entry['attempt_id'],
+                            question_id=entry['question_id'], answer=entry['answer'])
+            for entry in accepted
+        ])
+
+        SubmittedAnswerThrough = SubmittedAnswer.question_answers.through
+        SubmittedAnswerThrough.objects.bulk_create([
+            SubmittedAnswerThrough(submittedanswer_id=submitted_answer.pk, questionanswer_id=question_answer_id)
+            for submitted_answer, entry in zip(submitted_answers, accepted)
+            for question_answer_id in entry['question_answer_ids']
+        ])
+
+        count_submissions([
+            (questions[entry['question_id']], entry['question_id'], entry['question_answer_ids'])
+            for entry in accepted
+        ])
+    return len(accepted)
+
+
+def flush():
+    """
+    Moves queued submissions to the database in bulk inserts of SUBMISSION_QUEUE_BATCH_SIZE until no unclaimed
+    submission is left, and returns how many were written.
+    """
+    total = 0
+    while True:
+        ids, entries = _claim(settings.SUBMISSION_QUEUE_BATCH_SIZE)
+        if not ids:
+            return total
+        total += _write(entries)
+        _connection().executemany('DELETE FROM submission WHERE id = ?', [(pk,) for pk in ids])
+
+
+def flush_attempt(attempt_id):
+    """
+    Moves the submissions queued for one attempt to the database, and returns True once the queue holds none
+    of them. Submissions another flusher has claimed are waited for until it removes them, or until its claims
+    expire and this flush takes them over, but no longer than SUBMISSION_QUEUE_FLUSH_TIMEOUT seconds,
+    after which False is returned.
+    """
+    deadline = time.monotonic() + settings.SUBMISSION_QUEUE_FLUSH_TIMEOUT
+    while True:
+        ids, entries = _claim(settings.SUBMISSION_QUEUE_BATCH_SIZE, attempt_id)
+        if ids:
+            _write(entries)
+            _connection().executemany('DELETE FROM submission WHERE id = ?', [(pk,) for pk in ids])
+        elif not _connection().execute('SELECT 1 FROM submission WHERE attempt_id = ? LIMIT 1',
+                                       (attempt_id,)).fetchone():
+            return True
+        elif time.monotonic() >= deadline:
+            return False
+        else:
+            time.sleep(0.05)
+
+
+def _flush_forever():
+    while True:
+        time.sleep(settings.SUBMISSION_QUEUE_FLUSH_INTERVAL)
+        close_old_connections()
+        try:
+            flush()
+        except Exception:
+            # The claims expire, so whatever this flush held is retried by the next one.
+            logger.exception('Flushing the submission queue failed.')
+
+
+def start_flusher():
+    """
+    Starts a thread in this process that flushes the queue every SUBMISSION_QUEUE_FLUSH_INTERVAL seconds.
+    Every web process that queued something runs one, so a submission waits at most one interval plus
+    the flush itself while any of them is alive. The flush_submissions command does the same from outside.
+    """
+    if settings.SUBMISSION_QUEUE_FLUSH_INTERVAL <= 0:
+        return
+    with _flusher_lock:
+        if _flusher['pid'] == os.getpid() and _flusher['thread'].is_alive():
+            return
+        thread = threading.Thread(target=_flush_forever, name='submission-queue-flusher', daemon=True)
+        thread.start()
+        _flusher.update(pid=os.getpid(), thread=thread)
@@ -1,9 +1,19 @@
+import json
+import shutil
+import tempfile
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
 
 from article.models import Article
-from quiz.models import Quiz, Question, QuestionAnswer, SubmittedAnswer
+from quiz import submission_queue
+from quiz.models import Quiz, Question, QuestionAnswer, SubmittedAnswer, QuizAttempt, QuizSubmissionCounter, \
+    QuestionAnswerSubmissionCounter
 from user.models import USER_ROLES
 
 User = get_user_model()
@@ -79,8 +89,10 @@ class QuizTests(APITestCase):
 
         question.question_answers.set([question_answers])
         question.save()
+        attempt = QuizAttempt.objects.create(user=self.user, quiz=quiz)
 
         data = {
+            "attempt_public_id": attempt.public_id,
             "question_public_id": question.public_id,
             "question_answers": [question_answers.public_id],
         }
@@ -88,3 +100,546 @@ class QuizTests(APITestCase):
         response = self.client.post('/quiz/question/answer/submit/', data, format='json')
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(SubmittedAnswer.objects.count(), 1)
+
+    def test_retrieve_quiz_query_count(self):
+        article = Article.objects.create(author=self.user, title='title', description='description')
+        quiz = Quiz.objects.create(author=self.user, title='title', description='description', article=article)
+
+        for question_count in (1, 10):
+            for order in range(Question.objects.count(), question_count):
+                question = Question.objects.create(quiz=quiz,
+                                                   title="Quiz",
+                                                   description="Quiz desc",
+                                                   question_type="M",
+                                                   order=order)
+                answers = [QuestionAnswer.objects.create(question=question, value=value) for value in range(4)]
+                question.question_answers.set(answers[:2])
+
+            with self.assertNumQueries(5):
+                response = self.client.get(f'/quiz/id/{quiz.public_id}/')
+
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(response.data['questions']), question_count)
+            question_data = response.data['questions'][0]
+            self.assertEqual(len(question_data['possible_answers']), 4)
+            self.assertEqual(question_data['possible_answers'][0]['question']['quiz']['public_id'], str(quiz.public_id))
+            self.assertEqual(len(question_data['possible_answers'][0]['question']['question_answers']), 2)
+
+    def test_retrieve_quiz_snapshot_cache(self):
+        article = Article.objects.create(author=self.user, title='title', description='description')
+        quiz = Quiz.objects.create(author=self.user, title='title', description='description', article=article)
+        question = Question.objects.create(quiz=quiz,
+                                           title="Quiz",
+                                           description="Quiz desc",
+                                           question_type="S",
+                                           order=1)
+        answer = QuestionAnswer.objects.create(question=question, value=9)
+
+        self.client.get(f'/quiz/id/{quiz.public_id}/')
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/quiz/id/{quiz.public_id}/')
+        self.assertEqual(response.data['questions'][0]['possible_answers'][0]['value'], '9')
+
+        # Another worker changes the quiz, and this worker's cache never hears of it.
+        etag = response['ETag']
+        QuestionAnswer.objects.filter(pk=answer.pk).update(value=11)
+        Quiz.objects.filter(pk=quiz.pk).update(updated_at=timezone.now())
+
+        response = self.client.get(f'/quiz/id/{quiz.public_id}/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['questions'][0]['possible_answers'][0]['value'], '11')
+
+        answer.value = 10
+        answer.save()
+
+        response = self.client.get(f'/quiz/id/{quiz.public_id}/')
+        self.assertEqual(response.data['questions'][0]['possible_answers'][0]['value'], '10')
+
+        self.user.first_name = 'Ada'
+        self.user.save()
+
+        response = self.client.get(f'/quiz/id/{quiz.public_id}/')
+        self.assertEqual(response.data['author']['first_name'], 'Ada')
+
+        quiz.delete()
+
+        response = self.client.get(f'/quiz/id/{quiz.public_id}/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_conditional_retrieve(self):
+        article = Article.objects.create(author=self.user, title='title', description='description')
+        quiz = Quiz.objects.create(author=self.user, title='title', description='description', article=article)
+        question = Question.objects.create(quiz=quiz, title="Quiz", description="Quiz desc", question_type="S")
+        answer = QuestionAnswer.objects.create(question=question, value=9)
+        question.question_answers.add(answer)
+
+        quiz_etag = self.client.get(f'/quiz/id/{quiz.public_id}/')['ETag']
+        question_etag = self.client.get(f'/quiz/question/id/{question.public_id}/')['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/quiz/id/{quiz.public_id}/', headers={'If-None-Match': quiz_etag})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/quiz/question/id/{question.public_id}/',
+                                       headers={'If-None-Match': question_etag})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        answer.value = 10
+        answer.save()
+
+        response = self.client.get(f'/quiz/id/{quiz.public_id}/', headers={'If-None-Match': quiz_etag})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], quiz_etag)
+        response = self.client.get(f'/quiz/question/id/{question.public_id}/', headers={'If-None-Match': question_etag})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['question_answers'][0]['value'], '10')
+
+        quiz_etag = self.client.get(f'/quiz/id/{quiz.public_id}/')['ETag']
+        self.user.first_name = 'Ada'
+        self.user.save()
+
+        response = self.client.get(f'/quiz/id/{quiz.public_id}/', headers={'If-None-Match': quiz_etag})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['author']['first_name'], 'Ada')
+
+    def test_bulk_create_quiz(self):
+        article = Article.objects.create(author=self.user, title='title', description='description')
+
+        data = {
+            "title": "Quiz",
+            "description": "Quiz desc",
+            "article_public_id": article.public_id,
+            "questions": [
+                {
+                    "title": f"Question {order}",
+                    "description": "Question desc",
+                    "question_type": "S",
+                    "order": order,
+                    "possible_answers": [
+                        {"value": "3", "order": 0, "correct": True},
+                        {"value": "4", "order": 1},
+                    ]
+                }
+                for order in range(5)
+            ] + [
+                {
+                    "title": "Open question",
+                    "description": "Question desc",
+                    "question_type": "O",
+                    "answer": "30",
+                    "order": 5
+                }
+            ]
+        }
+
+        response = self.client.post('/quiz/bulk/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Quiz.objects.count(), 1)
+        self.assertEqual(Question.objects.count(), 6)
+        self.assertEqual(QuestionAnswer.objects.count(), 10)
+        self.assertEqual(Question.question_answers.through.objects.count(), 5)
+        self.assertEqual(len(response.data['questions']), 6)
+        self.assertEqual(Question.objects.get(question_type='O').answer, '30')
+        self.assertTrue(all(question.question_answers.get().value == '3'
+                            for question in Question.objects.filter(question_type='S')))
+
+    def test_bulk_create_quiz_is_validated_up_front(self):
+        article = Article.objects.create(author=self.user, title='title', description='description')
+
+        data = {
+            "title": "Quiz",
+            "description": "Quiz desc",
+            "article_public_id": article.public_id,
+            "questions": [
+                {
+                    "title": "Question",
+                    "description": "Question desc",
+                    "question_type": "S",
+                    "possible_answers": [{"value": "3", "correct": True}]
+                },
+                {
+                    "title": "Question",
+                    "description": "Question desc",
+                    "question_type": "S",
+                    "possible_answers": [{"value": "3", "correct": True}, {"value": "4", "correct": True}]
+                }
+            ]
+        }
+
+        response = self.client.post('/quiz/bulk/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Quiz.objects.count(), 0)
+        self.assertEqual(Question.objects.count(), 0)
+
+    def test_batch_submit_answers(self):
+        article = Article.objects.create(author=self.user, title='title', description='description')
+        quiz = Quiz.objects.create(author=self.user, title='title', description='description', article=article)
+        data = {"quiz_public_id": quiz.public_id, "answers": []}
+        for order in range(10):
+            question = Question.objects.create(quiz=quiz,
+                                               title="Quiz",
+                                               description="Quiz desc",
+                                               question_type="M",
+                                               order=order)
+            answers = [QuestionAnswer.objects.create(question=question, value=value) for value in range(3)]
+            data["answers"].append({
+                "question_public_id": question.public_id,
+                "question_answers": [answer.public_id for answer in answers[:2]],
+            })
+
+        with self.assertNumQueries(10):
+            response = self.client.post('/quiz/question/answer/submit/batch/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(SubmittedAnswer.objects.count(), 10)
+        self.assertEqual(SubmittedAnswer.question_answers.through.objects.count(), 20)
+        self.assertTrue(SubmittedAnswer.objects.filter(public_id=response.data['answers'][0]['public_id']).exists())
+
+    def test_batch_submit_rejects_foreign_answers(self):
+        article = Article.objects.create(author=self.user, title='title', description='description')
+        quiz = Quiz.objects.create(author=self.user, title='title', description='description', article=article)
+        question = Question.objects.create(quiz=quiz, title="Quiz", description="Quiz desc", question_type="S")
+        other_question = Question.objects.create(quiz=quiz, title="Quiz", description="Quiz desc", question_type="S")
+        other_answer = QuestionAnswer.objects.create(question=other_question, value=9)
+
+        data = {
+            "quiz_public_id": quiz.public_id,
+            "answers": [{"question_public_id": question.public_id, "question_answers": [other_answer.public_id]}]
+        }
+
+        response = self.client.post('/quiz/question/answer/submit/batch/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('question_answers', response.data['answers'][0])
+        self.assertEqual(SubmittedAnswer.objects.count(), 0)
+
+        answers = [QuestionAnswer.objects.create(question=question, value=value) for value in range(2)]
+        for selection in ([answers[0], answers[0]], answers):
+            data["answers"][0]["question_answers"] = [answer.public_id for answer in selection]
+            response = self.client.post('/quiz/question/answer/submit/batch/', data, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('question_answers', response.data['answers'][0])
+        self.assertEqual(SubmittedAnswer.objects.count(), 0)
+
+    def test_grade_submissions(self):
+        article = Article.objects.create(author=self.user, title='title', description='description')
+        quiz = Quiz.objects.create(author=self.user, title='title', description='description', article=article)
+        single = Question.objects.create(quiz=quiz, title="Single", description="desc", question_type="S")
+        single_answers = [QuestionAnswer.objects.create(question=single, value=value) for value in range(3)]
+        single.question_answers.set(single_answers[:1])
+        multiple = Question.objects.create(quiz=quiz, title="Multiple", description="desc", question_type="M")
+        multiple_answers = [QuestionAnswer.objects.create(question=multiple, value=value) for value in range(3)]
+        multiple.question_answers.set(multiple_answers[:2])
+        open_question = Question.objects.create(quiz=quiz, title="Open", description="desc", question_type="O",
+                                                answer="Warsaw")
+
+        attempts = [
+            [(single, [single_answers[0]], None), (multiple, multiple_answers[:2], None), (open_question, [], ' warsaw ')],
+            [(single, [single_answers[1]], None), (multiple, multiple_answers[:1], None), (open_question, [], 'Cracow')],
+        ]
+        submissions = []
+        for attempt in attempts:
+            data = {
+                "quiz_public_id": quiz.public_id,
+                "answers": [
+                    {"question_public_id": question.public_id,
+                     "question_answers": [answer.public_id for answer in answers],
+                     "answer": value}
+                    for question, answers, value in attempt
+                ]
+            }
+            response = self.client.post('/quiz/question/answer/submit/batch/', data, format='json')
+            submissions.append([answer['public_id'] for answer in response.data['answers']])
+
+        response = self.client.post(f'/quiz/id/{quiz.public_id}/grade/', {"submissions": submissions[0]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['score'], response.data['max_score']), (3, 3))
+
+        response = self.client.post(f'/quiz/id/{quiz.public_id}/grade/', {"submissions": submissions[0][:1]},
+                                    format='json')
+        self.assertEqual((response.data['score'], response.data['max_score']), (1, 3))
+
+        response = self.client.get(f'/quiz/id/{quiz.public_id}/results/')
+        self.assertEqual((response.data['score'], response.data['max_score']), (3, 6))
+        self.assertEqual({(result['submitted'], result['correct']) for result in response.data['questions']}, {(2, 1)})
+
+        single.question_answers.set(single_answers[1:2])
+
+        response = self.client.post(f'/quiz/id/{quiz.public_id}/grade/', {"submissions": submissions[1]}, format='json')
+        self.assertEqual((response.data['score'], response.data['max_score']), (1, 3))
+
+    def test_quiz_attempt(self):
+        student = User.objects.create_user(email='student@student.com',
+                                           username='student',
+                                           password='studentpass',
+                                           role=USER_ROLES["Student"])
+        article = Article.objects.create(author=self.user, title='title', description='description')
+        quiz = Quiz.objects.create(author=self.user, title='title', description='description', article=article)
+        questions = []
+        for order in range(5):
+            question = Question.objects.create(quiz=quiz, title="Quiz", description="desc", question_type="S")
+            answers = [QuestionAnswer.objects.create(question=question, value=value) for value in range(2)]
+            question.question_answers.set(answers[:1])
+            questions.append((question, answers))
+
+        self.client.force_authenticate(user=student)
+        response = self.client.post('/quiz/attempt/', {"quiz_public_id": quiz.public_id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        attempt_public_id = response.data['public_id']
+
+        data = {
+            "quiz_public_id": quiz.public_id,
+            "attempt_public_id": attempt_public_id,
+            "answers": [{"question_public_id": question.public_id, "question_answers": [answers[order % 2].public_id]}
+                        for order, (question, answers) in enumerate(questions)]
+        }
+        response = self.client.post('/quiz/question/answer/submit/batch/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.client.post('/quiz/question/answer/submit/batch/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/quiz/attempt/id/{attempt_public_id}/')
+        self.assertEqual(len(response.data['answers']), 5)
+        self.assertIsNotNone(response.data['finished_at'])
+
+        response = self.client.get(f'/quiz/attempt/id/{attempt_public_id}/result/')
+        self.assertEqual((response.data['score'], response.data['max_score']), (3, 5))
+
+        response = self.client.get(f'/quiz/attempt/?quiz={quiz.public_id}')
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(self.client.get('/quiz/attempt/?quiz=abc').status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(f'/quiz/id/{quiz.public_id}/results/')
+        self.assertEqual(response.data['attempts'], [{'attempt_public_id': QuizAttempt.objects.get().public_id,
+                                                      'score': 3,
+                                                      'max_score': 5}])
+
+        Question.objects.create(quiz=quiz, title="Open", description="desc", question_type="O", answer="Warsaw")
+        response = self.client.get(f'/quiz/id/{quiz.public_id}/results/')
+        self.assertEqual((response.data['score'], response.data['max_score']), (3, 6))
+
+    def test_quiz_analytics(self):
+        article = Article.objects.create(author=self.user, title='title', description='description')
+        quiz = Quiz.objects.create(author=self.user, title='title', description='description', article=article)
+        single = Question.objects.create(quiz=quiz, title="Single", description="desc", question_type="S", order=0)
+        options = [QuestionAnswer.objects.create(question=single, value=value, order=value) for value in range(3)]
+        open_question = Question.objects.create(quiz=quiz, title="Open", description="desc", question_type="O", order=1)
+
+        for index, value in enumerate(['Warsaw', ' warsaw', 'New  York', 'WARSAW', 'Gdansk', 'new york']):
+            attempt = QuizAttempt.objects.create(user=self.user, quiz=quiz)
+            SubmittedAnswer.objects.create(attempt=attempt, question=single).question_answers.set([options[index % 2]])
+            SubmittedAnswer.objects.create(attempt=attempt, question=open_question, answer=value)
+
+        response = self.client.get(f'/quiz/id/{quiz.public_id}/analytics/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        single_data, open_data = response.data
+        self.assertEqual(single_data['submissions'], 6)
+        self.assertEqual([option['count'] for option in single_data['options']], [3, 3, 0])
+        self.assertEqual(open_data['open_answers'][:2], [{'answer': 'warsaw', 'count': 3}, {'answer': 'new york', 'count': 2}])
+
+        with self.assertNumQueries(2):
+            self.client.get(f'/quiz/id/{quiz.public_id}/analytics/')
+
+    def test_submission_counters(self):
+        article = Article.objects.create(author=self.user, title='title', description='description')
+        quiz = Quiz.objects.create(author=self.user, title='title', description='description', article=article)
+        question = Question.objects.create(quiz=quiz, title="Quiz", description="desc", question_type="S")
+        answers = [QuestionAnswer.objects.create(question=question, value=value) for value in range(2)]
+
+        for answer in [answers[0], answers[0], answers[1]]:
+            attempt = QuizAttempt.objects.create(user=self.user, quiz=quiz)
+            response = self.client.post('/quiz/question/answer/submit/', {
+                "attempt_public_id": attempt.public_id,
+                "question_public_id": question.public_id,
+                "question_answers": [answer.public_id],
+            }, format='json')
+        self.client.delete(f'/quiz/question/answer/submit/id/{response.data["public_id"]}/')
+
+        response = self.client.get(f'/quiz/id/{quiz.public_id}/counters/')
+        self.assertEqual(response.data['submissions'], 2)
+        self.assertEqual(response.data['questions'][0]['submissions'], 2)
+        self.assertEqual([option['submissions'] for option in response.data['questions'][0]['options']], [2, 0])
+
+        QuizSubmissionCounter.objects.filter(quiz=quiz).update(submissions=7)
+        QuestionAnswerSubmissionCounter.objects.filter(question_answer=answers[1]).delete()
+
+        output = StringIO()
+        call_command('rebuild_submission_counters', stdout=output)
+        self.assertIn(f'Quiz {quiz.pk}: stored 7, actual 2', output.getvalue())
+        self.assertIn(f'QuestionAnswer {answers[1].pk}: stored missing, actual 0', output.getvalue())
+        self.assertEqual(QuizSubmissionCounter.objects.get(quiz=quiz).submissions, 2)
+        self.assertTrue(QuestionAnswerSubmissionCounter.objects.filter(question_answer=answers[1]).exists())
+
+        QuizAttempt.objects.filter(answers__question_answers=answers[0]).first().delete()
+        self.assertEqual(QuizSubmissionCounter.objects.get(quiz=quiz).submissions, 1)
+        self.assertEqual(QuestionAnswerSubmissionCounter.objects.get(question_answer=answers[0]).submissions, 1)
+        question.delete()
+        self.assertEqual(QuizSubmissionCounter.objects.get(quiz=quiz).submissions, 0)
+
+    def test_submission_queue(self):
+        article = Article.objects.create(author=self.user, title='title', description='description')
+        quiz = Quiz.objects.create(author=self.user, title='title', description='description', article=article)
+        questions = [Question.objects.create(quiz=quiz, title="Quiz", description="desc", question_type="S")
+                     for _ in range(2)]
+        answers = [QuestionAnswer.objects.create(question=question, value=1) for question in questions]
+        attempt = QuizAttempt.objects.create(user=self.user, quiz=quiz)
+        queue_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, queue_dir, ignore_errors=True)
+
+        with override_settings(SUBMISSION_QUEUE_PATH=f'{queue_dir}/queue.sqlite3', SUBMISSION_QUEUE_FLUSH_INTERVAL=0):
+            public_ids = []
+            for question, answer in zip(questions, answers):
+                response = self.client.post('/quiz/question/answer/submit/', {
+                    "attempt_public_id": attempt.public_id,
+                    "question_public_id": question.public_id,
+                    "question_answers": [answer.public_id],
+                }, format='json')
+                self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+                public_ids.append(response.data['public_id'])
+            self.assertEqual(SubmittedAnswer.objects.count(), 0)
+
+            response = self.client.post('/quiz/question/answer/submit/', {
+                "attempt_public_id": attempt.public_id,
+                "question_public_id": questions[0].public_id,
+                "question_answers": [],
+            }, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+            response = self.client.get(f'/quiz/question/answer/submit/id/{public_ids[0]}/')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.json()['question_answers'], [str(answers[0].public_id)])
+
+            other = User.objects.create_user(email='other@other.com', username='other', password='testpass')
+            self.client.force_authenticate(user=other)
+            response = self.client.get(f'/quiz/question/answer/submit/id/{public_ids[0]}/')
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+            self.client.force_authenticate(user=self.user)
+
+            output = StringIO()
+            call_command('flush_submissions', stdout=output)
+            self.assertIn('Flushed 2 submissions, 0 still queued.', output.getvalue())
+            self.assertEqual(set(SubmittedAnswer.objects.values_list('public_id', flat=True)), set(public_ids))
+            self.assertEqual(QuizSubmissionCounter.objects.get(quiz=quiz).submissions, 2)
+
+            response = self.client.get(f'/quiz/question/answer/submit/id/{public_ids[1]}/')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.json()['question_answers'], [str(answers[1].public_id)])
+
+            # A flusher claimed the answer and died, finishing the attempt waits for its claim to expire.
+            attempt = QuizAttempt.objects.create(user=self.user, quiz=quiz)
+            self.client.post('/quiz/question/answer/submit/', {
+                "attempt_public_id": attempt.public_id,
+                "question_public_id": questions[0].public_id,
+                "question_answers": [answers[0].public_id],
+            }, format='json')
+            with override_settings(SUBMISSION_QUEUE_CLAIM_TIMEOUT=1):
+                submission_queue._claim(10)
+                response = self.client.post(f'/quiz/attempt/id/{attempt.public_id}/finish/')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertTrue(attempt.answers.filter(question=questions[0]).exists())
+            self.assertEqual(submission_queue.pending(), 0)
+
+            # Finishing waits no longer than SUBMISSION_QUEUE_FLUSH_TIMEOUT for answers another flusher holds.
+            attempt = QuizAttempt.objects.create(user=self.user, quiz=quiz)
+            self.client.post('/quiz/question/answer/submit/', {
+                "attempt_public_id": attempt.public_id,
+                "question_public_id": questions[0].public_id,
+                "question_answers": [answers[0].public_id],
+            }, format='json')
+            batch = {"quiz_public_id": quiz.public_id, "attempt_public_id": attempt.public_id, "answers": [{
+                "question_public_id": questions[1].public_id,
+                "question_answers": [answers[1].public_id],
+            }]}
+            submission_queue._claim(10)
+            with override_settings(SUBMISSION_QUEUE_FLUSH_TIMEOUT=0.1):
+                response = self.client.post(f'/quiz/attempt/id/{attempt.public_id}/finish/')
+                self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+                response = self.client.post('/quiz/question/answer/submit/batch/', batch, format='json')
+                self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+            attempt.refresh_from_db()
+            self.assertIsNone(attempt.finished_at)
+
+            # Once the claim expired, the batch stores the queued answer before it validates its own.
+            with override_settings(SUBMISSION_QUEUE_CLAIM_TIMEOUT=0):
+                response = self.client.post('/quiz/question/answer/submit/batch/', batch, format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(attempt.answers.count(), 2)
+
+            # An answer that reaches the queue after its attempt was finished is dropped.
+            attempt = QuizAttempt.objects.create(user=self.user, quiz=quiz)
+            self.client.post('/quiz/question/answer/submit/', {
+                "attempt_public_id": attempt.public_id,
+                "question_public_id": questions[0].public_id,
+                "question_answers": [answers[0].public_id],
+            }, format='json')
+            QuizAttempt.objects.filter(pk=attempt.pk).update(finished_at=timezone.now())
+            with self.assertLogs('quiz.submission_queue', 'WARNING'):
+                submission_queue.flush()
+            self.assertFalse(attempt.answers.exists())
+            self.assertEqual(submission_queue.pending(), 0)
+
+            response = self.client.post('/quiz/question/answer/submit/', {
+                "attempt_public_id": QuizAttempt.objects.create(user=self.user, quiz=quiz).public_id,
+                "question_public_id": questions[1].public_id,
+                "question_answers": [answers[1].public_id],
+            }, format='json')
+            questions[1].delete()
+            response = self.client.get(f'/quiz/question/answer/submit/id/{response.data["public_id"]}/')
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_export_submissions(self):
+        article = Article.objects.create(author=self.user, title='title', description='description')
+        quiz = Quiz.objects.create(author=self.user, title='title', description='description', article=article)
+        question = Question.objects.create(quiz=quiz, title="Capital", description="desc", question_type="M")
+        answers = [QuestionAnswer.objects.create(question=question, value=value, order=value) for value in range(3)]
+        question.question_answers.set(answers[:2])
+        for selected in [answers[:2], answers[2:]]:
+            attempt = QuizAttempt.objects.create(user=self.user, quiz=quiz)
+            SubmittedAnswer.objects.create(attempt=attempt, question=question).question_answers.set(selected)
+
+        response = self.client.get(f'/quiz/id/{quiz.public_id}/export/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[0].startswith('public_id,attempt_public_id,username'))
+        self.assertTrue(lines[1].endswith(',Capital,,0; 1,True'))
+
+        response = self.client.get(f'/quiz/id/{quiz.public_id}/export/?type=ndjson')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([(row['question_answers'], row['correct']) for row in rows], [(['0', '1'], True), (['2'], False)])
+
+        output = StringIO()
+        call_command('export_submissions', str(quiz.public_id), '--format', 'ndjson', stdout=output)
+        self.assertEqual(len(output.getvalue().splitlines()), 2)
+
+    def test_unified_search(self):
+        article = Article.objects.create(author=self.user, title='Volcanoes', description='How mountains erupt')
+        Article.objects.create(author=self.user, title='Rivers', description='Where water flows')
+        data = {
+            "title": "Eruptions",
+            "description": "Check what you know about volcanoes",
+            "article_public_id": article.public_id,
+            "questions": [
+                {"title": "Which volcano buried Pompeii?", "description": "Pick one", "question_type": "O",
+                 "answer": "Vesuvius", "order": 0},
+                {"title": "What is lava?", "description": "Explain", "question_type": "O", "answer": "Rock",
+                 "order": 1},
+            ]
+        }
+        quiz = Quiz.objects.get(public_id=self.client.post('/quiz/bulk/', data, format='json').data['public_id'])
+        question = quiz.questions.get(order=0)
+
+        response = self.client.get('/search/?q=volcano')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(hit['type'] for hit in response.data), ['article', 'question', 'quiz'])
+        # Ranked in one index, so the quiz that only mentions volcanoes in its description comes last.
+        self.assertEqual(response.data[-1]['type'], 'quiz')
+        question_hit = next(hit for hit in response.data if hit['type'] == 'question')
+        self.assertEqual(question_hit, {'type': 'question', 'public_id': question.public_id,
+                                        'title': 'Which volcano buried Pompeii?', 'quiz_public_id': quiz.public_id,
+                                        'article_public_id': article.public_id})
+
+        response = self.client.get('/search/?q=volcano&limit=1')
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(self.client.get('/search/').status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,13 +1,20 @@
 from django.urls import path
 
-from quiz.views import QuizViewSet, QuestionViewSet, QuestionAnswerViewSet, SubmittedQuestionViewSet
+from quiz.views import QuizViewSet, QuestionViewSet, QuestionAnswerViewSet, SubmittedQuestionViewSet, \
+    QuizAttemptViewSet
 
 urlpatterns = [
     path('', QuizViewSet.as_view({'post': 'create'})),
+    path('bulk/', QuizViewSet.as_view({'post': 'bulk_create'})),
     path('id/<uuid:public_id>/', QuizViewSet.as_view({'get': 'retrieve',
                                                    'put': 'update',
                                                    'patch': 'partial_update',
                                                    'delete': 'destroy'})),
+    path('id/<uuid:public_id>/results/', QuizViewSet.as_view({'get': 'results'})),
+    path('id/<uuid:public_id>/export/', QuizViewSet.as_view({'get': 'export'})),
+    path('id/<uuid:public_id>/counters/', QuizViewSet.as_view({'get': 'counters'})),
+    path('id/<uuid:public_id>/analytics/', QuizViewSet.as_view({'get': 'analytics'})),
+    path('id/<uuid:public_id>/grade/', QuizViewSet.as_view({'post': 'grade'})),
     path('question/', QuestionViewSet.as_view({'post': 'create'})),
     path('question/id/<uuid:public_id>/', QuestionViewSet.as_view({'get': 'retrieve',
                                                                 'put': 'update',
@@ -19,8 +26,13 @@ urlpatterns = [
                                                                              'patch': 'partial_update',
                                                                              'delete': 'destroy'})),
     path('question/answer/submit/', SubmittedQuestionViewSet.as_view({'post': 'create'})),
+    path('question/answer/submit/batch/', SubmittedQuestionViewSet.as_view({'post': 'batch_create'})),
     path('question/answer/submit/id/<uuid:public_id>/', SubmittedQuestionViewSet.as_view({'get': 'retrieve',
                                                                                        'put': 'update',
                                                                                        'patch': 'partial_update',
                                                                                        'delete': 'destroy'})),
+    path('attempt/', QuizAttemptViewSet.as_view({'get': 'list', 'post': 'create'})),
+    path('attempt/id/<uuid:public_id>/', QuizAttemptViewSet.as_view({'get': 'retrieve'})),
+    path('attempt/id/<uuid:public_id>/finish/', QuizAttemptViewSet.as_view({'post': 'finish'})),
+    path('attempt/id/<uuid:public_id>/result/', QuizAttemptViewSet.as_view({'get': 'result'})),
 ]
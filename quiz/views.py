@@ -1,15 +1,46 @@
-from rest_framework import viewsets, filters, status
+import uuid
+
+from django.db import transaction
+from django.db.models import Prefetch, Q
+from django.http import StreamingHttpResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.translation import gettext as _
+from rest_framework import viewsets, filters, status, serializers
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from quiz.models import Quiz, QuestionAnswer, Question, SubmittedAnswer
+from CorralSnake.conditional import ConditionalRetrieveMixin
+from CorralSnake.replicas import ReplicaReadMixin
+from quiz.analytics import answer_distribution
+from quiz.cache import get_quiz_version, get_quiz_snapshot, set_quiz_snapshot, get_quiz_analytics, \
+    set_quiz_analytics
+from quiz.grading import AnswerKey, grade_queryset
+from quiz import submission_queue
+from quiz.counters import count_submissions
+from quiz.exports import EXPORT_FORMATS, export_lines
+from quiz.models import Quiz, QuestionAnswer, Question, SubmittedAnswer, QuizAttempt, QuizSubmissionCounter
 from quiz.serializers import QuizSerializer, QuestionSerializer, QuizFullSerializer, QuestionAnswerSerializer, \
-    SubmittedAnswerSerializer
+    SubmittedAnswerSerializer, QuizBulkSerializer, SubmittedAnswerBatchSerializer, GradeSubmissionsSerializer, \
+    QuizAttemptSerializer
 from user.permissions import TeacherOnly
 
 
-class QuizViewSet(viewsets.ModelViewSet):
+def flush_queued_answers(attempt_id):
+    """
+    Stores the answers still queued for an attempt that is about to be finished, and returns None once they are,
+    or a 503 response when another flusher holds them for longer than SUBMISSION_QUEUE_FLUSH_TIMEOUT.
+    """
+    if not submission_queue.is_enabled() or submission_queue.flush_attempt(attempt_id):
+        return None
+    return Response({'detail': _('Answers of this attempt are still being stored, try again later. ')},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+class QuizViewSet(ConditionalRetrieveMixin, viewsets.ModelViewSet):
     lookup_field = 'public_id'
     queryset = Quiz.objects.all().order_by('id')
+    # Changes to questions and their answers touch the quiz row.
+    validator_fields = ['updated_at', 'author__updated_at']
 
     def create(self, request, *args, **kwargs):
         """
@@ -20,13 +51,135 @@ class QuizViewSet(viewsets.ModelViewSet):
         self.perform_create(serializer)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    def bulk_create(self, request, *args, **kwargs):
+        """
+        Creates a quiz together with its questions and their possible answers from one nested document.
+        Only accessible by users with the 'TeacherOnly' permission.
+        """
+        serializer = self.get_serializer(data=request.data | {'author_pk': request.user.pk})
+        serializer.is_valid(raise_exception=True)
+        quiz = serializer.save()
+
+        quiz = Quiz.objects.with_full_tree().get(pk=quiz.pk)
+        serializer = QuizFullSerializer(quiz, context=self.get_serializer_context())
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
     def retrieve(self, request, *args, **kwargs):
         """
         Retrieves a quiz by its public ID. Any authenticated user can access this.
+        Serves a cached snapshot while the quiz version it was built for is current,
+        or 304 when the client's copy is still current.
+        """
+        response = self.get_not_modified_response(request)
+        if response is not None:
+            return response
+
+        public_id = kwargs[self.lookup_field]
+        base_url = request.build_absolute_uri('/')
+        version = self.version
+        if version is None:
+            # The quiz does not exist.
+            return Response(self.get_serializer(self.get_object()).data)
+
+        data = get_quiz_snapshot(public_id, version, base_url)
+        if data is None:
+            quiz = self.get_object()
+            data = self.get_serializer(quiz).data
+            set_quiz_snapshot(public_id, version, base_url, data)
+        return Response(data)
+
+    def get_validators(self, request):
+        """
+        Keeps the version for the snapshot key. It is read from the database, which every worker sees,
+        so a change made through one worker is never hidden by the cache of another.
+        """
+        validators = super().get_validators(request)
+        self.version = validators[0] if validators is not None else None
+        return validators
+
+    def results(self, request, *args, **kwargs):
+        """
+        Grades every answer submitted to a quiz and returns per-question and per-attempt results.
+        Only the author of the quiz is allowed to see them.
         """
         quiz = self.get_object()
-        serializer = self.get_serializer(quiz)
-        return Response(serializer.data)
+        if quiz.author != request.user:
+            return Response(status=status.HTTP_401_UNAUTHORIZED)
+        result = grade_queryset(AnswerKey.for_quiz(quiz.public_id), SubmittedAnswer.objects.filter(question__quiz=quiz),
+                                quiz.attempts.values_list('public_id', flat=True))
+        return Response(result.summary() | {'attempts': result.attempt_results()})
+
+    def export(self, request, *args, **kwargs):
+        """
+        Streams every answer submitted to a quiz as CSV (default) or NDJSON, chosen with ?type=csv|ndjson.
+        Only the author of the quiz is allowed to export it.
+        """
+        quiz = self.get_object()
+        if quiz.author != request.user:
+            return Response(status=status.HTTP_401_UNAUTHORIZED)
+
+        export_format = request.query_params.get('type', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(export_lines(quiz, export_format), content_type=EXPORT_FORMATS[export_format])
+        response['Content-Disposition'] = f'attachment; filename="quiz-{quiz.public_id}.{export_format}"'
+        return response
+
+    def counters(self, request, *args, **kwargs):
+        """
+        Returns the maintained submission counters of a quiz, its questions and their possible answers.
+        Only the author of the quiz is allowed to see them.
+        """
+        quiz = self.get_object()
+        if quiz.author != request.user:
+            return Response(status=status.HTTP_401_UNAUTHORIZED)
+
+        options = {}
+        for question_id, public_id, submissions in QuestionAnswer.objects.filter(question__quiz=quiz).order_by(
+                'order', 'id').values_list('question_id', 'public_id', 'submission_counter__submissions'):
+            options.setdefault(question_id, []).append({'public_id': public_id, 'submissions': submissions or 0})
+
+        return Response({
+            'submissions': QuizSubmissionCounter.objects.filter(quiz=quiz).values_list(
+                'submissions', flat=True).first() or 0,
+            'questions': [
+                {'question_public_id': public_id, 'submissions': submissions or 0, 'options': options.get(question_id, [])}
+                for question_id, public_id, submissions in quiz.questions.order_by('order', 'id').values_list(
+                    'id', 'public_id', 'submission_counter__submissions')
+            ]
+        })
+
+    def analytics(self, request, *args, **kwargs):
+        """
+        Returns how a quiz was answered: picks per possible answer and the most common open answers per question.
+        Only the author of the quiz is allowed to see them.
+        """
+        quiz = self.get_object()
+        if quiz.author != request.user:
+            return Response(status=status.HTTP_401_UNAUTHORIZED)
+
+        version = get_quiz_version(quiz.public_id)
+        data = get_quiz_analytics(quiz.public_id, version)
+        if data is None:
+            data = answer_distribution(quiz)
+            set_quiz_analytics(quiz.public_id, version, data)
+        return Response(data)
+
+    def grade(self, request, *args, **kwargs):
+        """
+        Grades a set of answers submitted to a quiz, such as one student's attempt.
+        Only the author of the quiz is allowed to grade.
+        """
+        quiz = self.get_object()
+        if quiz.author != request.user:
+            return Response(status=status.HTTP_401_UNAUTHORIZED)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        submitted_answers = SubmittedAnswer.objects.filter(question__quiz=quiz,
+                                                           public_id__in=serializer.validated_data['submissions'])
+        result = grade_queryset(AnswerKey.for_quiz(quiz.public_id), submitted_answers)
+        return Response(result.summary() | {'answers': result.answer_results()})
 
     def update(self, request, *args, **kwargs):
         """
@@ -63,22 +216,34 @@ class QuizViewSet(viewsets.ModelViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     def get_permissions(self):
-        if self.action in ['create', 'update', 'partial_update', 'destroy']:
+        if self.action in ['create', 'bulk_create', 'results', 'export', 'counters', 'analytics', 'grade',
+                           'update', 'partial_update', 'destroy']:
             permission_classes = [TeacherOnly]
         else:
             permission_classes = [IsAuthenticated]
         return [permission() for permission in permission_classes]
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'retrieve':
+            return queryset.with_full_tree()
+        return queryset
+
     def get_serializer_class(self):
         if self.action == 'retrieve':
             return QuizFullSerializer
+        elif self.action == 'bulk_create':
+            return QuizBulkSerializer
+        elif self.action == 'grade':
+            return GradeSubmissionsSerializer
         return QuizSerializer
 
 
-class QuestionViewSet(viewsets.ModelViewSet):
+class QuestionViewSet(ConditionalRetrieveMixin, ReplicaReadMixin, viewsets.ModelViewSet):
     lookup_field = 'public_id'
     queryset = Question.objects.all().order_by('order')
     serializer_class = QuestionSerializer
+    validator_fields = ['updated_at', 'quiz__updated_at', 'quiz__author__updated_at']
 
     def create(self, request, *args, **kwargs):
         """
@@ -92,7 +257,12 @@ class QuestionViewSet(viewsets.ModelViewSet):
     def retrieve(self, request, *args, **kwargs):
         """
         Retrieves a question by its public ID. Any authenticated user can access this.
+        Answers with 304 when the client's copy is still current.
         """
+        response = self.get_not_modified_response(request)
+        if response is not None:
+            return response
+
         question = self.get_object()
         serializer = self.get_serializer(question)
         return Response(serializer.data)
@@ -206,17 +376,88 @@ class QuestionAnswerViewSet(viewsets.ModelViewSet):
 class SubmittedQuestionViewSet(viewsets.ModelViewSet):
     lookup_field = 'public_id'
     queryset = SubmittedAnswer.objects.all().order_by('id')
-    serializer_class = SubmittedAnswerSerializer
 
     def create(self, request, *args, **kwargs):
         """
         Creates a new question answer. Only accessible by users with the 'TeacherOnly' permission.
+        With SUBMISSION_QUEUE_PATH set, the answer is only queued and answered with 202 and its public_id,
+        it is written to the database with the next flush.
         """
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
+        if submission_queue.is_enabled():
+            entry = submission_queue.enqueue(request.user, serializer.validated_data['attempt'],
+                                             serializer.validated_data['question'],
+                                             serializer.validated_data.get('answer'),
+                                             serializer.validated_data.get('question_answers', []))
+            if entry is None:
+                raise serializers.ValidationError({'question_public_id': [_('Question was answered more than once. ')]})
+            return Response(self._queued_data(entry, serializer.validated_data['question']),
+                            status=status.HTTP_202_ACCEPTED)
         self.perform_create(serializer)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Retrieves a question answer by its public ID. Any authenticated user can access this.
+        Answers that are still queued can only be read back by the student who submitted them.
+        """
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            entry = submission_queue.get(self.kwargs['public_id']) if submission_queue.is_enabled() else None
+            if entry is None or entry['user_id'] != request.user.pk:
+                raise
+            return Response(self._queued_data(entry, get_object_or_404(Question, pk=entry['question_id'])))
+
+    def _queued_data(self, entry, question):
+        """
+        Renders a queued answer the way the serializer renders a stored one.
+        """
+        return {
+            'public_id': entry['public_id'],
+            'question': QuestionSerializer(question, context=self.get_serializer_context()).data,
+            'answer': entry['answer'],
+            'question_answers': entry['question_answer_public_ids'],
+        }
+
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            answer = serializer.save()
+            count_submissions([self._counted(answer, serializer.validated_data.get('question_answers', []))])
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            count_submissions([self._counted(serializer.instance, serializer.instance.question_answers.all())], delta=-1)
+            answer = serializer.save()
+            count_submissions([self._counted(answer, answer.question_answers.all())])
+
+    @staticmethod
+    def _counted(answer, question_answers):
+        return answer.question.quiz_id, answer.question_id, [question_answer.pk for question_answer in question_answers]
+
+    def batch_create(self, request, *args, **kwargs):
+        """
+        Creates all answers of a quiz attempt in one request. Any authenticated user can access this.
+        Answers queued for an existing attempt are stored first, so its validation sees them.
+        """
+        attempt_public_id = request.data.get('attempt_public_id') if isinstance(request.data, dict) else None
+        try:
+            attempt_id = QuizAttempt.objects.filter(
+                public_id=uuid.UUID(str(attempt_public_id)), user=request.user).values_list('pk', flat=True).first()
+        except ValueError:
+            # The serializer reports a malformed public ID.
+            attempt_id = None
+        if attempt_id is not None:
+            response = flush_queued_answers(attempt_id)
+            if response is not None:
+                return response
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
     # def retrieve(self, request, *args, **kwargs):
     #     """
     #     Retrieves a question answer by its public ID. Any authenticated user can access this.
@@ -265,3 +506,87 @@ class SubmittedQuestionViewSet(viewsets.ModelViewSet):
         else:
             permission_classes = [IsAuthenticated]
         return [permission() for permission in permission_classes]
+
+    def get_serializer_class(self):
+        if self.action == 'batch_create':
+            return SubmittedAnswerBatchSerializer
+        return SubmittedAnswerSerializer
+
+
+class QuizAttemptViewSet(viewsets.ModelViewSet):
+    lookup_field = 'public_id'
+    queryset = QuizAttempt.objects.all().order_by('-started_at')
+    serializer_class = QuizAttemptSerializer
+    permission_classes = [IsAuthenticated]
+
+    def create(self, request, *args, **kwargs):
+        """
+        Starts a new attempt at a quiz for the current user.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save(user=request.user)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Retrieves an attempt with its answers. Only the student who made it and the author of the quiz can access this.
+        """
+        attempt = self.get_object()
+        serializer = self.get_serializer(attempt)
+        return Response(serializer.data)
+
+    def list(self, request, *args, **kwargs):
+        """
+        Lists the current user's attempts, newest first, optionally only those at the quiz given by ?quiz=<public_id>.
+        """
+        return super().list(request, *args, **kwargs)
+
+    def finish(self, request, *args, **kwargs):
+        """
+        Finishes an attempt, after which no more answers can be submitted to it. Only the student who made it can do this.
+        Answers still queued for it are stored first.
+        """
+        attempt = self.get_object()
+        if attempt.user_id != request.user.pk:
+            return Response(status=status.HTTP_401_UNAUTHORIZED)
+        response = flush_queued_answers(attempt.pk)
+        if response is not None:
+            return response
+        if attempt.finished_at is None:
+            attempt.finished_at = timezone.now()
+            attempt.save(update_fields=['finished_at'])
+        serializer = self.get_serializer(attempt)
+        return Response(serializer.data)
+
+    def result(self, request, *args, **kwargs):
+        """
+        Grades an attempt. The student who made it can see the result once it is finished, the author of the quiz any time.
+        """
+        attempt = self.get_object()
+        if attempt.quiz.author_id != request.user.pk and attempt.finished_at is None:
+            return Response(status=status.HTTP_401_UNAUTHORIZED)
+        result = grade_queryset(AnswerKey.for_quiz(attempt.quiz.public_id), attempt.answers.all(), [attempt.public_id])
+        return Response(result.summary() | {'answers': result.answer_results()})
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            queryset = queryset.filter(user=self.request.user).select_related('user', 'quiz')
+            if self.request.query_params.get('quiz') is not None:
+                try:
+                    quiz_public_id = uuid.UUID(self.request.query_params['quiz'])
+                except ValueError:
+                    raise serializers.ValidationError({'quiz': [_('Must be a valid UUID. ')]})
+                queryset = queryset.filter(quiz__public_id=quiz_public_id)
+            return queryset.prefetch_related(self._answers_prefetch())
+
+        queryset = queryset.filter(Q(user=self.request.user) | Q(quiz__author=self.request.user))
+        if self.action in ['retrieve', 'finish']:
+            return queryset.select_related('user', 'quiz').prefetch_related(self._answers_prefetch())
+        return queryset.select_related('quiz')
+
+    @staticmethod
+    def _answers_prefetch():
+        return Prefetch('answers', queryset=SubmittedAnswer.objects.select_related('question')
+                        .prefetch_related('question_answers').order_by('id'))
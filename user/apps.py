@@ -4,3 +4,16 @@ from django.apps import AppConfig
 class UserConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'user'
+
+    def ready(self):
+        from django.db.models.signals import post_save, post_delete
+        from user.authentication import forget_user
+        from user.models import User
+        from user.search import user_index, user_autocomplete
+        from mediastore.references import track
+
+        user_index.connect(User)
+        user_autocomplete.connect(User)
+        track(User, 'pfp', 'pfp_variants')
+        post_save.connect(forget_user, sender=User)
+        post_delete.connect(forget_user, sender=User)
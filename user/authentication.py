@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+def _user_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    Resolves the user of an access token from the cache and loads it from the database only on a miss,
+    so authenticating a request usually costs no query. Entries live for JWT_USER_CACHE_SECONDS and are
+    dropped whenever the user is saved or deleted.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        key = _user_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            # Inactive and unknown users are rejected here, so they are never cached.
+            user = super().get_user(validated_token)
+            cache.set(key, user, timeout=settings.JWT_USER_CACHE_SECONDS)
+        elif api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+        return user
+
+
+def forget_user(sender, instance, **kwargs):
+    """
+    Drops the cached user right away and again once the transaction commits, in case a request cached
+    the old row in between.
+    """
+    key = _user_key(getattr(instance, api_settings.USER_ID_FIELD))
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
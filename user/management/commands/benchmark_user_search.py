@@ -0,0 +1,78 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from user.models import USER_ROLES
+from user.search import user_index
+
+User = get_user_model()
+
+SYLLABLES = [consonant + vowel for consonant in 'bcdfghjklmnprstwz' for vowel in 'aeiouy'] + ['ski', 'wicz', 'ek', 'an']
+
+
+def generate_name(rng, parts):
+    return ''.join(rng.choice(SYLLABLES) for _ in range(parts)).capitalize()
+
+
+def with_typo(rng, word):
+    index = rng.randrange(1, len(word) - 1)
+    return word[:index] + word[index + 1] + word[index] + word[index + 2:]
+
+
+class Command(BaseCommand):
+    help = ('Generates benchmark users up to the requested count and compares the latency of the indexed user search '
+            'against the previous icontains search. Run it against a scratch database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1_000_000)
+        parser.add_argument('--queries', type=int, default=50)
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        generated = User.objects.filter(username__startswith='bench-').count()
+        if generated < options['users']:
+            self.stdout.write(f'Generating {options["users"] - generated} users...')
+            for start in range(generated, options['users'], options['batch_size']):
+                stop = min(start + options['batch_size'], options['users'])
+                User.objects.bulk_create([
+                    User(username=f'bench-{index}', email=f'bench-{index}@bench.invalid', password='!',
+                         first_name=generate_name(rng, 2), last_name=generate_name(rng, 3),
+                         role=USER_ROLES['Student'])
+                    for index in range(start, stop)
+                ])
+            user_index.rebuild()
+
+        samples = list(User.objects.filter(username__startswith='bench-')
+                       .order_by('?').values_list('first_name', 'last_name')[:options['queries']])
+        queries = {
+            'prefix': [last_name[:4] for _, last_name in samples],
+            'full name': [f'{first_name} {last_name}' for first_name, last_name in samples],
+            'typo': [with_typo(rng, last_name) for _, last_name in samples],
+            'short prefix': [first_name[:2] for first_name, _ in samples],
+        }
+
+        queryset = User.objects.order_by('id')
+        for kind, texts in queries.items():
+            indexed = self.measure(lambda text: user_index.search(queryset, text), texts)
+            legacy = self.measure(lambda text: queryset.filter(
+                Q(username__icontains=text) | Q(first_name__icontains=text) | Q(last_name__icontains=text)), texts)
+            self.stdout.write(f'{kind:>12}: indexed median {statistics.median(indexed):.2f} ms, '
+                              f'p95 {self.percentile(indexed, 95):.2f} ms | icontains median '
+                              f'{statistics.median(legacy):.2f} ms, p95 {self.percentile(legacy, 95):.2f} ms')
+
+    def measure(self, search, texts):
+        timings = []
+        for text in texts:
+            started = time.perf_counter()
+            list(search(text)[:10])
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    def percentile(self, timings, percent):
+        return sorted(timings)[min(len(timings) - 1, len(timings) * percent // 100)]
@@ -0,0 +1,42 @@
+from django.db import migrations
+
+# The DDL is frozen here, so later changes to user.search do not change what this migration does.
+CREATE = {
+    'sqlite': [
+        'CREATE VIRTUAL TABLE "user_user_trgm" USING fts5(username, first_name, last_name, tokenize="trigram")',
+        'INSERT INTO "user_user_trgm" (rowid, username, first_name, last_name) '
+        'SELECT id, username, first_name, last_name FROM "user_user"',
+    ],
+    'postgresql': [
+        'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+        'CREATE INDEX "user_user_trgm_idx" ON "user_user" USING GIN (('
+        "lower(coalesce(\"username\", '') || ' ' || coalesce(\"first_name\", '') || ' ' || "
+        "coalesce(\"last_name\", ''))) gin_trgm_ops)",
+    ],
+}
+
+DROP = {
+    'sqlite': ['DROP TABLE IF EXISTS "user_user_trgm"'],
+    'postgresql': ['DROP INDEX IF EXISTS "user_user_trgm_idx"'],
+}
+
+
+def create_search_index(apps, schema_editor):
+    for statement in CREATE.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    for statement in DROP.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0006_alter_user_pfp'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 14:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0007_user_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='pfp_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.1 on 2026-10-18 15:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0009_user_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSearchEntry',
+            fields=[
+                ('user', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'user_user_trgm',
+                'managed': False,
+            },
+        ),
+    ]
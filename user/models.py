@@ -8,6 +8,8 @@ from CorralSnake.utils import uuid_upload_to
 from user.managers import CustomUserManager
 
 
+PFP_SIZES = [32, 64, 256]
+
 USER_ROLES = {
     "Teacher": "Teacher",
     "Student": "Student",
@@ -19,6 +21,7 @@ class User(AbstractUser):
     public_id = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
     email = models.EmailField(unique=True, editable=False)
     pfp = models.ImageField(upload_to=uuid_upload_to('pfps'), default='defaults/pfps/default.png')
+    pfp_variants = models.JSONField(default=dict, blank=True, editable=False)
     username = models.CharField(null=False,
                                 blank=False,
                                 max_length=150,
@@ -26,6 +29,7 @@ class User(AbstractUser):
                                 editable=False,
                                 validators=[UnicodeUsernameValidator()])
     role = models.CharField(null=False, blank=False, choices=USER_ROLES, max_length=255)
+    updated_at = models.DateTimeField(auto_now=True)
 
     objects = CustomUserManager()
 
@@ -39,8 +43,13 @@ class User(AbstractUser):
     def get_full_name(self):
         return f'{self.first_name} {self.last_name}'
 
-    def delete(self, using=None, keep_parents=False):
-        if self.pfp.name != self.pfp.field.default:
-            self.pfp.delete()
+class UserSearchEntry(models.Model):
+    """
+    A row of the SQLite FTS5 table of user_index, so searches can join it. The table is not managed by Django.
+    """
+    user = models.OneToOneField(User, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid',
+                                related_name='search_entry')
 
-        return super().delete(using, keep_parents)
\ No newline at end of file
+    class Meta:
+        managed = False
+        db_table = 'user_user_trgm'
@@ -0,0 +1,5 @@
+from CorralSnake.autocomplete import PrefixIndex
+from CorralSnake.search import TrigramIndex
+
+user_index = TrigramIndex('user_user', {'username': 'A', 'first_name': 'B', 'last_name': 'B'})
+user_autocomplete = PrefixIndex(['username', 'first_name', 'last_name'], 'username')
@@ -1,6 +1,5 @@
 import datetime
 
-from PIL import Image
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.contrib.auth.hashers import make_password
@@ -8,10 +7,17 @@ from django.contrib.auth.password_validation import validate_password
 from django.utils.translation import gettext as _
 from rest_framework.validators import UniqueValidator
 
+from CorralSnake.fields import ImageVariantsField
+from CorralSnake.serializers import ImageVariantsMixin
+from user.models import PFP_SIZES
+
 User = get_user_model()
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(ImageVariantsMixin, serializers.ModelSerializer):
+    pfp_variants = ImageVariantsField()
+    variant_specs = {'pfp': ('square', PFP_SIZES)}
+
     class Meta:
         model = User
         fields = ['public_id',
@@ -20,20 +26,11 @@ class UserSerializer(serializers.ModelSerializer):
                   'first_name',
                   'last_name',
                   'pfp',
+                  'pfp_variants',
                   'password',
                   'role']
         extra_kwargs = {'password': {'write_only': True}}
 
-    def save(self, **kwargs):
-        user = super().save(**kwargs)
-
-        if user.pfp.name != user.pfp.field.default:
-            image = Image.open(user.pfp)
-            resized_image = image.resize((256, 256), Image.ANTIALIAS)
-            resized_image.save(user.pfp.path)
-
-        return user
-
     def create(self, validated_data):
         return User.objects.create_user(**validated_data)
 
@@ -66,6 +63,7 @@ class CreateUserSerializer(UserSerializer):
                   'first_name',
                   'last_name',
                   'pfp',
+                  'pfp_variants',
                   'password',
                   'role']
         extra_kwargs = {
@@ -76,7 +74,9 @@ class CreateUserSerializer(UserSerializer):
 
 
 class FriendSerializer(serializers.ModelSerializer):
+    pfp_variants = ImageVariantsField()
+
     class Meta:
         model = User
-        fields = ['public_id', 'username', 'first_name', 'last_name', 'pfp', 'role']
+        fields = ['public_id', 'username', 'first_name', 'last_name', 'pfp', 'pfp_variants', 'role']
         read_only_fields = ('public_id', 'first_name', 'last_name', 'pfp', 'role')
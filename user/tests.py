@@ -1,12 +1,34 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from PIL import Image
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
 
 User = get_user_model()
 
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def uploaded_image(name, size, color='teal'):
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
 
 class UserTests(APITestCase):
 
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
     def setUp(self):
         self.client = APIClient()
 
@@ -30,6 +52,33 @@ class UserTests(APITestCase):
         response = self.client.post('/auth/token/', data, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_token_user_is_cached(self):
+        user = User.objects.create_user(email='cached@test.com', username='cacheduser', password='cachedpass123',
+                                        role='Student')
+        response = self.client.post('/auth/token/', {"email": "cached@test.com", "password": "cachedpass123"},
+                                    format='json')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+
+        self.assertEqual(self.client.get('/user/').data['role'], 'Student')
+        with self.assertNumQueries(0):
+            response = self.client.get('/user/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        user.role = 'Teacher'
+        user.save()
+        self.assertEqual(self.client.get('/user/').data['role'], 'Teacher')
+
+        # Another worker changes the user, and this worker's cached copy is not dropped.
+        User.objects.filter(pk=user.pk).update(last_name='Kowalska')
+        response = self.client.patch('/user/', {'first_name': 'Anna'}, format='json')
+        self.assertEqual(response.data['last_name'], 'Kowalska')
+        user.refresh_from_db()
+        self.assertEqual((user.first_name, user.last_name), ('Anna', 'Kowalska'))
+
+        user.is_active = False
+        user.save()
+        self.assertEqual(self.client.get('/user/').status_code, status.HTTP_401_UNAUTHORIZED)
+
     def test_update_user_data(self):
         user = User.objects.create_user(email='update@test.com', username='updateuser', password='updatepass123')
         self.client.force_authenticate(user=user)
@@ -50,3 +99,94 @@ class UserTests(APITestCase):
         response = self.client.delete(f'/user/')
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertFalse(User.objects.filter(id=user.id).exists())
+
+    def test_search_users_cursor_pagination(self):
+        for index in range(12):
+            User.objects.create_user(email=f'search{index}@test.com', username=f'search{index}', password='searchpass123')
+        self.client.force_authenticate(user=User.objects.get(username='search0'))
+
+        response = self.client.get('/user/search/?q=search')
+        self.assertEqual(len(response.data['results']), 10)
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 2)
+
+        response = self.client.get('/user/search/?q=search&page=1')
+        self.assertEqual(response.data['count'], 12)
+
+    def test_search_users_typo_and_prefix(self):
+        kowalski = User.objects.create_user(email='jan@test.com', username='jkowal', password='searchpass123',
+                                            first_name='Jan', last_name='Kowalski')
+        User.objects.create_user(email='anna@test.com', username='anowak', password='searchpass123',
+                                 first_name='Anna', last_name='Nowak')
+        self.client.force_authenticate(user=kowalski)
+
+        response = self.client.get('/user/search/?q=kowlaski')
+        self.assertEqual(response.data['results'][0]['username'], 'jkowal')
+
+        response = self.client.get('/user/search/?q=an')
+        self.assertEqual([user['username'] for user in response.data['results']], ['anowak'])
+
+        kowalski.last_name = 'Zielinski'
+        kowalski.save()
+        response = self.client.get('/user/search/?q=zielin')
+        self.assertEqual([user['username'] for user in response.data['results']], ['jkowal'])
+
+    @override_settings(IMAGE_WORKERS=0, MEDIA_ROOT=MEDIA_ROOT)
+    def test_pfp_variants_are_rendered_after_upload(self):
+        user = User.objects.create_user(email='pfp@test.com', username='pfpuser', password='pfppass123')
+        self.client.force_authenticate(user=user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch('/user/', {'pfp': uploaded_image('me.png', (600, 400))}, format='multipart')
+        self.assertEqual(response.data['pfp_variants'], {})
+
+        user.refresh_from_db()
+        self.assertEqual(Image.open(user.pfp).size, (600, 400))
+        self.assertEqual(set(user.pfp_variants), {'32', '64', '256'})
+        with user.pfp.storage.open(user.pfp_variants['32']) as variant:
+            image = Image.open(variant)
+            self.assertEqual((image.format, image.size), ('WEBP', (32, 32)))
+
+        response = self.client.get('/user/')
+        self.assertTrue(response.data['pfp_variants']['64'].startswith('http://testserver/media/pfps/'))
+
+        stale_variants = user.pfp_variants
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch('/user/', {'pfp': uploaded_image('new.png', (300, 300), 'coral')}, format='multipart')
+        user.refresh_from_db()
+        self.assertNotEqual(user.pfp_variants, stale_variants)
+        self.assertFalse(any(user.pfp.storage.exists(name) for name in stale_variants.values()))
+
+
+class ReplicaRoutingTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='reader@test.com', username='reader', password='readerpass123',
+                                             first_name='Jan', last_name='Kowalski')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    @override_settings(DATABASE_REPLICAS=['replica1'])
+    def test_reads_use_replicas_until_the_user_writes(self):
+        # The replica is stood in for by the primary, only the routing decision is observed.
+        with mock.patch('CorralSnake.replicas.random.choice', return_value='default') as choice:
+            response = self.client.get('/user/search/?q=kowalski')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertTrue(choice.called)
+
+            choice.reset_mock()
+            self.client.patch('/user/', {'first_name': 'Janek'}, format='json')
+            self.assertFalse(choice.called)
+
+            response = self.client.get('/user/search/?q=kowalski')
+            self.assertEqual(response.data['results'][0]['first_name'], 'Janek')
+            self.assertFalse(choice.called)
+
+            # The pin travels with the client, so it holds on a worker whose cache never saw the write.
+            cache.clear()
+            self.client.get('/user/search/?q=kowalski')
+            self.assertFalse(choice.called)
+
+            other = User.objects.create_user(email='other@test.com', username='other', password='otherpass123')
+            self.client.force_authenticate(user=other)
+            self.client.get('/user/search/?q=kowalski')
+            self.assertTrue(choice.called)
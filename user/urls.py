@@ -9,6 +9,7 @@ urlpatterns = [
                                   'patch': 'partial_update',
                                   'delete': 'destroy'})),
 
+    path('autocomplete/', UserViewSet.as_view({'get': 'autocomplete'})),
     path('search/', UserViewSet.as_view({'get': 'list'})),
     path('<uuid:public_id>/', UserViewSet.as_view({'get': 'retrieve_other'})),
 ]
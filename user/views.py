@@ -1,19 +1,29 @@
-from rest_framework import viewsets, status, filters
+from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.decorators import action
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.shortcuts import get_object_or_404
 
+from CorralSnake.pagination import KeysetPagination
+from CorralSnake.replicas import ReplicaReadMixin
+from CorralSnake.search import FullTextSearchFilter
+from CorralSnake.utils import get_limit
+
+from .search import user_index, user_autocomplete
 from .serializers import UserSerializer, CreateUserSerializer, FriendSerializer
 
 User = get_user_model()
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     lookup_field = 'public_id'
     queryset = User.objects.all().order_by('id')
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['username', 'first_name', 'last_name']
+    filter_backends = [FullTextSearchFilter]
+    search_index = user_index
+    pagination_class = KeysetPagination
+    replica_actions = {'retrieve', 'list', 'retrieve_other'}
 
     def create(self, request, *args, **kwargs):
         """
@@ -54,7 +64,7 @@ class UserViewSet(viewsets.ModelViewSet):
         """
         Handles the updating of the current user's information.
         """
-        serializer = self.get_serializer(request.user, data=request.data)
+        serializer = self.get_serializer(self.get_current_user(), data=request.data)
         serializer.is_valid(raise_exception=True)
         self.perform_update(serializer)
         return Response(serializer.data)
@@ -63,7 +73,7 @@ class UserViewSet(viewsets.ModelViewSet):
         """
         Handles partial updating of the current user's information.
         """
-        serializer = self.get_serializer(request.user, data=request.data, partial=True)
+        serializer = self.get_serializer(self.get_current_user(), data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
         self.perform_update(serializer)
         return Response(serializer.data)
@@ -72,9 +82,29 @@ class UserViewSet(viewsets.ModelViewSet):
         """
         Handles deletion of the current user's account.
         """
-        self.perform_destroy(request.user)
+        self.perform_destroy(self.get_current_user())
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def get_current_user(self):
+        """
+        Loads the current user's row for the actions that save or delete it. The authenticated user may come
+        from the token cache, which can be JWT_USER_CACHE_SECONDS old, and saving it would undo newer changes.
+        """
+        return get_object_or_404(self.get_queryset(), pk=self.request.user.pk)
+
+    @action(detail=False, methods=['GET'])
+    def autocomplete(self, request, *args, **kwargs):
+        """
+        Suggests users whose username or names start with the typed query, straight from the in-memory prefix index.
+        """
+        query = request.query_params.get('q')
+        if query is None:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+
+        limit = get_limit(request, settings.AUTOCOMPLETE_MAX_RESULTS, settings.AUTOCOMPLETE_MAX_RESULTS)
+        suggestions = user_autocomplete.lookup(query, limit)
+        return Response([{'public_id': public_id, 'username': username} for public_id, username in suggestions])
+
     def get_permissions(self):
         if self.action == 'create' or self.action == 'retrieve_other':
             permission_classes = [AllowAny]